@@ -0,0 +1,183 @@
+# admission.py
+#
+# Admission control for LLM calls. A fixed number of completions may run at
+# once; requests waiting for a slot sit in a bounded queue per mode, and when
+# that queue is full (or the wait times out) the request is shed with
+# Overloaded so the API can answer 503 with a Retry-After estimate.
+
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from config import (
+    ADMISSION_MAX_INFLIGHT_LLM, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_S, ADMISSION_DEGRADE_AT
+)
+
+
+class Overloaded(Exception):
+
+    def __init__(self, mode, retry_after):
+        super().__init__(f"Service saturated for mode '{mode}', retry in {retry_after}s")
+        self.mode = mode
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+
+    def __init__(self, max_inflight=ADMISSION_MAX_INFLIGHT_LLM, max_queue=ADMISSION_MAX_QUEUE,
+                 queue_timeout_s=ADMISSION_QUEUE_TIMEOUT_S, degrade_at=ADMISSION_DEGRADE_AT):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.degrade_at = degrade_at
+
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._avg_hold_s = 5.0  # running estimate of how long a completion holds a slot
+        self._waiting = Counter()
+        self._admitted = Counter()
+        self._rejected = Counter()
+        self._degraded = Counter()
+        self._cache_hits = Counter()
+
+    def _queue_limit(self, mode):
+        return self.max_queue.get(mode, max(self.max_queue.values(), default=0))
+
+    def retry_after(self, mode):
+        """Seconds until a slot is likely free for a new request of `mode`."""
+        with self._lock:
+            backlog = self._waiting[mode] + 1
+            return max(1, min(60, math.ceil(self._avg_hold_s * backlog / self.max_inflight)))
+
+    def check(self, mode):
+        """Raise Overloaded if a new request of `mode` would not fit in its queue."""
+        with self._lock:
+            full = self._waiting[mode] >= self._queue_limit(mode)
+        if full:
+            self._reject(mode)
+
+    def under_pressure(self, mode):
+        """True when every slot is busy and the mode's queue is filling up."""
+        with self._lock:
+            return self._waiting[mode] >= self.degrade_at * self._queue_limit(mode) and self._inflight >= self.max_inflight
+
+    def _reject(self, mode):
+        retry_after = self.retry_after(mode)
+        with self._lock:
+            self._rejected[mode] += 1
+        raise Overloaded(mode, retry_after)
+
+    def record_degraded(self, mode):
+        with self._lock:
+            self._degraded[mode] += 1
+
+    def record_cache_hit(self, mode):
+        with self._lock:
+            self._cache_hits[mode] += 1
+
+    def acquire(self, mode, bounded=True):
+        """Take one in-flight LLM slot and return a function that releases it.
+
+        Bounded callers (interactive requests) are shed when the mode's queue
+        is full or the wait exceeds the timeout; unbounded callers (background
+        jobs) wait as long as it takes. The release function is safe to call
+        more than once.
+        """
+        with self._lock:
+            full = bounded and self._waiting[mode] >= self._queue_limit(mode)
+            if not full:
+                self._waiting[mode] += 1
+        if full:
+            self._reject(mode)
+
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout_s if bounded else None)
+        finally:
+            with self._lock:
+                self._waiting[mode] -= 1
+        if not acquired:
+            self._reject(mode)
+
+        with self._lock:
+            self._inflight += 1
+            self._admitted[mode] += 1
+
+        start = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            held = time.perf_counter() - start
+            with self._lock:
+                if released:
+                    return
+                released = True
+                self._inflight -= 1
+                self._avg_hold_s = 0.8 * self._avg_hold_s + 0.2 * held
+            self._slots.release()
+
+        return release
+
+    @contextmanager
+    def llm_slot(self, mode, bounded=True):
+        """Hold one in-flight LLM slot for the duration of the block; see `acquire`."""
+        release = self.acquire(mode, bounded=bounded)
+        try:
+            yield
+        finally:
+            release()
+
+    def metrics(self):
+
+        with self._lock:
+            return {
+                "inflight_llm": self._inflight,
+                "max_inflight_llm": self.max_inflight,
+                "queue_depth": dict(self._waiting),
+                "max_queue": dict(self.max_queue),
+                "admitted": dict(self._admitted),
+                "rejected": dict(self._rejected),
+                "degraded": dict(self._degraded),
+                "cache_hits": dict(self._cache_hits),
+                "avg_llm_seconds": round(self._avg_hold_s, 2),
+            }
+
+
+class AdmittedBackend:
+    """Generation backend wrapper that holds an LLM slot for each completion.
+
+    With `release`, the caller already took the slot with
+    `AdmissionController.acquire`; it is released when the completion ends.
+    """
+
+    def __init__(self, backend, controller, mode, bounded=True, release=None):
+        self.backend = backend
+        self.controller = controller
+        self.mode = mode
+        self.bounded = bounded
+        self.release = release
+
+    @contextmanager
+    def _slot(self):
+        if self.release is None:
+            with self.controller.llm_slot(self.mode, bounded=self.bounded):
+                yield
+            return
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    def complete(self, system_prompt, prompt, temperature=0.2):
+
+        with self._slot():
+            return self.backend.complete(system_prompt, prompt, temperature=temperature)
+
+    def stream(self, system_prompt, prompt, temperature=0.2):
+
+        with self._slot():
+            yield from self.backend.stream(system_prompt, prompt, temperature=temperature)
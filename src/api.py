@@ -1,15 +1,27 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List
-import pickle
+from typing import List, Optional
 import os
-import faiss
 import logging
 
-from retrieval import ask_question
+from retrieval import answer_question, stream_answer
 from build_index import get_sources
+from config import (
+    SHARD_REMOTES, DEFAULT_CORPUS, CORPORA_DIR,
+    ADMISSION_DEGRADE, ADMISSION_DEGRADED_CHUNK_COUNT, ANSWER_CACHE_SIZE, ANSWER_CACHE_PATH, QUERY_LOG_PATH
+)
+from admission import AdmissionController, AdmittedBackend, Overloaded
+from cache import LRUCache, answer_cache_key, load_answer_cache
+from querylog import get_query_logger
+from generation import get_backend
+from corpora import CorpusManager, CorpusNotFound
+from jobs import JobQueue, QueueFull
+from sharding import check_authkey, parse_remotes, ShardRouter
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -17,19 +29,35 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
-# Initialize index and chunk store
+# Corpora are loaded on first use and evicted least-recently-used under a memory budget
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+remotes = parse_remotes(SHARD_REMOTES)
+if remotes:
+    check_authkey()  # remote shards unpickle what they receive; refuse to start without a secret
+corpora = CorpusManager(os.path.join(root_dir, CORPORA_DIR), remotes=remotes)
+
+# Load the default corpus up front so the service fails fast without an index
 try:
-    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    logger.info(f"Loading index from {os.path.join(root_dir, 'rousseau_works.index')}")
-    index = faiss.read_index(os.path.join(root_dir, "rousseau_works.index"))
-    logger.info(f"Loading chunk store from {os.path.join(root_dir, 'rousseau_works_chunk_store.pkl')}")
-    with open(os.path.join(root_dir, "rousseau_works_chunk_store.pkl"), "rb") as f:
-        chunk_store = pickle.load(f)
-    logger.info(f"Successfully loaded index with {index.ntotal} vectors and {len(chunk_store)} chunks")
+    default = corpora.get(DEFAULT_CORPUS)
+    logger.info(f"Successfully loaded corpus '{DEFAULT_CORPUS}' with {default.index.ntotal} vectors in {default.load_ms:.0f} ms")
 except Exception as e:
     logger.error(f"Error loading index or chunk store: {e}")
     raise
 
+# LLM concurrency limits and an answer cache shared by /ask, /ask/stream and jobs
+admission = AdmissionController()
+answer_cache = LRUCache(ANSWER_CACHE_SIZE)
+
+# Answers pre-generated by warm_cache.py from the query log, minus those
+# generated against an older build of their corpus
+warmed = load_answer_cache(os.path.join(root_dir, ANSWER_CACHE_PATH), fingerprint=corpora.fingerprint)
+for key, response in warmed.items():
+    answer_cache.put((corpora.build(key[0]), *key), response)
+if warmed:
+    logger.info(f"Warmed answer cache with {len(warmed)} entries")
+
+query_log = get_query_logger(os.path.join(root_dir, QUERY_LOG_PATH))
+
 origins = [
     "http://localhost:3000",  # Next.js default port
     "http://localhost:5173",  # Vite default port
@@ -46,7 +74,38 @@ app.add_middleware(
 class Question(BaseModel):
     query: str
     chunk_count: int = 5  # Default to 5 if not specified
-    mode: str = "understanding"  # Default to understanding mode
+    mode: str = "understanding"  # "understanding", "retrieval" or "extractive" (no LLM call)
+    rerank: Optional[bool] = None  # None falls back to RERANK_ENABLED
+    sources: Optional[List[str]] = None  # Restrict search to these source titles
+    corpus: str = DEFAULT_CORPUS
+
+class JobRequest(Question):
+    priority: Optional[int] = None  # Lower runs first; defaults per mode from JOB_MODE_PRIORITIES
+
+def search_target(question):
+    """The corpus, index and batcher to use for a question.
+
+    Loads the corpus on first use. When the question is narrowed to some
+    sources, it searches a view over those sources' shards (sharded layout)
+    or filters the single index's hits by source title, and skips the
+    shared batcher.
+    """
+    try:
+        corpus = corpora.get(question.corpus)
+    except CorpusNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown corpus: {question.corpus}")
+
+    if not question.sources:
+        return corpus, corpus.index, corpus.batcher
+
+    if isinstance(corpus.index, ShardRouter):
+        shards = corpus.index.route(source_titles=set(question.sources))
+        target = corpus.index.view(shards) if shards else None
+    else:
+        target = corpus.source_view(question.sources)
+    if target is None or target.ntotal == 0:
+        raise HTTPException(status_code=400, detail="None of the requested sources are indexed")
+    return corpus, target, None
 
 @app.get("/")
 def home():
@@ -56,29 +115,213 @@ def home():
 def list_sources():
     return [src["metadata"] for src in get_sources()]
 
+@app.get("/corpora")
+def list_corpora():
+    return {"available": corpora.available(), **corpora.stats()}
+
+def cache_key(question):
+    """Answer cache key for a question.
+
+    Includes the corpus build, so once a rebuilt corpus is (re)loaded its
+    old answers, whose chunk ids and citations point into the previous
+    chunk store, are no longer served.
+    """
+    return (corpora.build(question.corpus), *answer_cache_key(
+        question.corpus, question.query, question.mode,
+        question.chunk_count, question.rerank, question.sources
+    ))
+
+def degrade(question):
+    """A cheaper version of the question to answer while the LLM is saturated."""
+    admission.record_degraded(question.mode)
+    if ADMISSION_DEGRADE == "fewer_chunks":
+        return question.model_copy(update={"chunk_count": min(question.chunk_count, ADMISSION_DEGRADED_CHUNK_COUNT)}), "fewer_chunks"
+    return question.model_copy(update={"mode": "extractive"}), "extractive"
+
+def log_query(question, timings, cache_hit, **extra):
+    query_log.log(
+        question.query, question.mode, question.chunk_count, timings=timings, cache_hit=cache_hit,
+        corpus=question.corpus, **extra
+    )
+
+def answer(question, background=False):
+    """Load the corpus, retrieve and generate; returns the /ask response body. Blocking.
+
+    Identical questions are served from the answer cache. Interactive
+    requests are degraded when the LLM is saturated and shed with
+    Overloaded when their mode's queue is full; background jobs just wait.
+    """
+    requested = question
+
+    cached = answer_cache.get(cache_key(question))
+    if cached is not None:
+        admission.record_cache_hit(question.mode)
+        log_query(requested, {}, cache_hit=True)
+        return {**cached, "cached": True, "degraded": None}
+
+    degraded = None
+    if not background and question.mode != "extractive":
+        admission.check(question.mode)
+        if admission.under_pressure(question.mode):
+            question, degraded = degrade(question)
+            cached = answer_cache.get(cache_key(question))
+            if cached is not None:
+                log_query(requested, {}, cache_hit=True, degraded=degraded)
+                return {**cached, "cached": True, "degraded": degraded}
+
+    corpus, target, target_batcher = search_target(question)
+    result = answer_question(
+        question.query, target, corpus.chunks,
+        mode=question.mode, top_k=question.chunk_count, rerank=question.rerank, batcher=target_batcher,
+        backend=AdmittedBackend(get_backend(), admission, question.mode, bounded=not background)
+    )
+
+    response = {
+        "answer": result["answer"],
+        "sources": result["sources"],
+        "highlights": result.get("highlights"),
+        "chunk_ids": result["chunk_ids"],
+        "timings": result["timings"]
+    }
+    answer_cache.put(cache_key(question), response)
+    log_query(requested, result["timings"], cache_hit=False, degraded=degraded)
+
+    return {**response, "cached": False, "degraded": degraded}
+
+def overloaded_response(e):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(e)},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 @app.post("/ask")
 async def ask(question: Question):
     try:
         logger.info(f"Received question: {question.query} with chunk_count: {question.chunk_count} and mode: {question.mode}")
-        full_response = ask_question(question.query, index, chunk_store, mode=question.mode, top_k=question.chunk_count)
-        
-        # Split the response into answer and sources
-        parts = full_response.split("\n\n---\n**Sources Consulted:**\n\n")
-        if len(parts) != 2:
-            logger.error("Unexpected response format")
-            raise HTTPException(status_code=500, detail="Unexpected response format from model")
-            
-        answer = parts[0].strip()
-        sources = [s.strip() for s in parts[1].split("\n\n") if s.strip()]
-        
+        # Run the blocking corpus load/embed/search/completion off the event loop so requests overlap
+        response = await run_in_threadpool(answer, question)
+
         logger.info("Successfully generated answer")
-        return {
-            "answer": answer,
-            "sources": sources
-        }
+        return response
+    except Overloaded as e:
+        logger.warning(f"Shedding question: {e}")
+        return overloaded_response(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing question: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def describe_chunk(chunk_id, chunks):
+    item = chunks[chunk_id]
+    meta = item['metadata']
+    return {
+        "id": chunk_id,
+        "source_title": meta.get('source_title'),
+        "author": meta.get('author'),
+        "section_title": meta.get('section_title'),
+        "excerpt": item['text'][:200].strip(),
+    }
+
+@app.get("/chunks/{chunk_id}/related")
+def related_chunks(chunk_id: int, corpus: str = DEFAULT_CORPUS, k: Optional[int] = Query(None, ge=1)):
+    """Precomputed nearest neighbors of a chunk; no encoding or search."""
+    try:
+        loaded = corpora.get(corpus)
+    except CorpusNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown corpus: {corpus}")
+    if loaded.neighbor_ids is None:
+        raise HTTPException(status_code=404, detail=f"No neighbor graph for corpus '{corpus}', rebuild the index")
+    if not 0 <= chunk_id < len(loaded.chunks):
+        raise HTTPException(status_code=404, detail=f"Unknown chunk: {chunk_id}")
+
+    ids = loaded.neighbor_ids[chunk_id][:k]
+    distances = loaded.neighbor_distances[chunk_id][:k]
+    return {
+        "chunk": describe_chunk(chunk_id, loaded.chunks),
+        "related": [
+            {**describe_chunk(int(i), loaded.chunks), "distance": float(d)}
+            for i, d in zip(ids, distances) if i >= 0
+        ],
+    }
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "admission": admission.metrics(),
+        "answer_cache": {"size": len(answer_cache), "maxsize": answer_cache.maxsize},
+        "jobs": jobs.stats(),
+    }
+
+@app.post("/ask/stream")
+def ask_stream(question: Question):
+    logger.info(f"Received streaming question: {question.query} with chunk_count: {question.chunk_count} and mode: {question.mode}")
+    requested, degraded = question, None
+    if question.mode != "extractive":
+        try:
+            admission.check(question.mode)
+        except Overloaded as e:
+            logger.warning(f"Shedding streaming question: {e}")
+            return overloaded_response(e)
+        if admission.under_pressure(question.mode):
+            question, degraded = degrade(question)
+
+    corpus, target, target_batcher = search_target(question)
+
+    # Take the LLM slot before the response starts, so overflow still gets a 503
+    release = None
+    if question.mode != "extractive":
+        try:
+            release = admission.acquire(question.mode, bounded=True)
+        except Overloaded as e:
+            logger.warning(f"Shedding streaming question: {e}")
+            return overloaded_response(e)
+
+    backend = AdmittedBackend(get_backend(), admission, question.mode, release=release)
+
+    def stream():
+        timings = {}
+        try:
+            yield from stream_answer(
+                question.query, target, corpus.chunks, mode=question.mode, top_k=question.chunk_count,
+                rerank=question.rerank, backend=backend, batcher=target_batcher, timings=timings
+            )
+        finally:
+            # Also frees the slot when retrieval or prompt building fails before generation starts
+            if release is not None:
+                release()
+            # Logged once the answer is complete (or the client has gone away)
+            log_query(requested, timings, cache_hit=False, streamed=True, degraded=degraded)
+
+    # Starlette iterates sync generators in the threadpool; the background
+    # task frees the slot if the client disconnects before the body starts
+    return StreamingResponse(
+        stream(),
+        media_type="text/plain; charset=utf-8",
+        background=BackgroundTask(release) if release else None
+    )
+
+# Long answers can be submitted as background jobs and polled
+jobs = JobQueue(lambda request: answer(Question(**request), background=True))
+
+@app.post("/jobs", status_code=202)
+def submit_job(job_request: JobRequest):
+    question = Question(**job_request.model_dump(exclude={"priority"}))
+    try:
+        job, deduplicated = jobs.submit(cache_key(question), question.model_dump(), question.mode, priority=job_request.priority)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later")
+
+    logger.info(f"Job {job.id} {'deduplicated' if deduplicated else 'queued'} for question: {question.query} (mode: {question.mode})")
+    return {"id": job.id, "status": job.status, "deduplicated": deduplicated}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.to_dict()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,105 @@
+# batching.py
+#
+# Dynamic micro-batching of query encodes. Concurrent requests hand their
+# question to a QueryBatcher, which waits up to `max_wait_ms` (or until
+# `max_batch_size` questions are pending), encodes them in one forward pass,
+# runs one matrix `index.search` and routes each row back to its caller.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from embedder import embed_texts
+
+
+class QueryBatcher:
+
+    def __init__(self, index, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.index = index
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def search(self, question, k, timings=None, return_embedding=False):
+        """Embed and search one question as part of a batch; returns (D, I) for it.
+
+        When a dict is given, `timings` receives the time spent waiting for the
+        batch and the batch's embed and search times in milliseconds. With
+        `return_embedding`, returns (D, I, embedding) where embedding is the
+        question's (1, dim) vector.
+        """
+        future = Future()
+        request = (question, k, future, time.perf_counter())
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put(request)
+        if closed:
+            self._process([request])
+
+        D, I, embedding, batch_timings = future.result()
+        if timings is not None:
+            timings.update(batch_timings)
+        if return_embedding:
+            return D, I, embedding
+        return D, I
+
+    def close(self):
+        """Stop the worker thread once pending questions are answered.
+
+        Later calls to `search` still work, without batching.
+        """
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+
+    def _run(self):
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._process(batch)
+                    return
+                batch.append(item)
+
+            self._process(batch)
+
+    def _process(self, batch):
+
+        try:
+            started = time.perf_counter()
+            embeddings = embed_texts([question for question, _, _, _ in batch], show_progress_bar=False)
+            embedded = time.perf_counter()
+            D, I = self.index.search(embeddings, max(k for _, k, _, _ in batch))
+            searched = time.perf_counter()
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for row, (_, k, future, submitted) in enumerate(batch):
+            future.set_result((D[row:row + 1, :k], I[row:row + 1, :k], embeddings[row:row + 1], {
+                "batch_wait": (started - submitted) * 1000,
+                "embed": (embedded - started) * 1000,
+                "search": (searched - embedded) * 1000,
+            }))
@@ -0,0 +1,83 @@
+# bench_batching.py
+#
+# QPS and latency of query embed + FAISS search at increasing concurrency,
+# with the QueryBatcher on and off. No LLM calls are made.
+
+import argparse
+import statistics
+import threading
+import time
+
+from config import CACHE_PREFIX, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from embedder import embed_texts
+from indexing import load_index
+from batching import QueryBatcher
+
+QUESTIONS = [
+    "What is the general will?",
+    "Why can sovereignty not be represented?",
+    "How did private property give rise to inequality?",
+    "What is the role of the legislator?",
+    "Do the arts and sciences corrupt morals?",
+    "What distinguishes public economy from private economy?",
+    "When is a dictatorship justified?",
+    "Why does the state need a civil religion?",
+]
+
+
+def direct_search(index, question, k):
+    return index.search(embed_texts([question], show_progress_bar=False), k)
+
+def run(search, concurrency, per_client, k):
+
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        for i in range(per_client):
+            start = time.perf_counter()
+            search(QUESTIONS[(offset + i) % len(QUESTIONS)], k)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    return len(latencies) / elapsed, statistics.median(latencies), p95
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched query encoding.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--per-client", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-batch-size", type=int, default=BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    index, _ = load_index(CACHE_PREFIX)
+    if index is None:
+        print("No index found. Please run `build_index.py` first.")
+        return
+
+    batcher = QueryBatcher(index, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    direct_search(index, "warm up", args.top_k)
+
+    print(f"batch size <= {args.max_batch_size}, window {args.max_wait_ms} ms, {args.per_client} queries per client")
+    print(f"{'clients':>7} | {'mode':>8} | {'QPS':>8} | {'p50':>9} | {'p95':>9}")
+    for concurrency in args.concurrency:
+        for label, search in [
+            ("direct", lambda q, k: direct_search(index, q, k)),
+            ("batched", lambda q, k: batcher.search(q, k)),
+        ]:
+            qps, p50, p95 = run(search, concurrency, args.per_client, args.top_k)
+            print(f"{concurrency:>7} | {label:>8} | {qps:8.1f} | {p50:7.1f}ms | {p95:7.1f}ms")
+
+if __name__ == "__main__":
+    main()
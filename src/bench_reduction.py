@@ -0,0 +1,96 @@
+# bench_reduction.py
+#
+# Report on index compression: for several reduction settings, compare
+# recall@k against the exact full-width index, serialized index size and
+# single-query search latency, to pick a compact configuration.
+
+import argparse
+import statistics
+import time
+
+import faiss
+import numpy as np
+
+from config import CACHE_PREFIX
+from embedder import embed_texts
+from indexing import load_index, make_faiss_index, min_training_vectors
+
+QUESTIONS = [
+    "What is the general will?",
+    "Why can sovereignty not be represented?",
+    "How did private property give rise to inequality?",
+    "What is the role of the legislator?",
+    "Do the arts and sciences corrupt morals?",
+    "What distinguishes public economy from private economy?",
+    "When is a dictatorship justified?",
+    "Why does the state need a civil religion?",
+]
+
+CONFIGS = [
+    ("full float32", dict(reduce_dim=0)),
+    ("full float16", dict(reduce_dim=0, fp16=True)),
+    ("pca 128", dict(reduce_dim=128)),
+    ("pca 128 float16", dict(reduce_dim=128, fp16=True)),
+    ("pca 64", dict(reduce_dim=64)),
+    ("pca 64 float16", dict(reduce_dim=64, fp16=True)),
+    ("opq 64", dict(reduce_dim=64, transform="opq")),
+]
+
+
+def recall_at_k(approx, exact, k):
+    return float(np.mean([len(set(a[:k]) & set(e[:k])) / k for a, e in zip(approx, exact)]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Report recall, size and latency of reduced indexes.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sample", type=int, default=200, help="Chunks reused as extra queries")
+    args = parser.parse_args()
+
+    index, chunk_store = load_index(CACHE_PREFIX)
+    if index is None:
+        print("No index found. Please run `build_index.py` first.")
+        return
+
+    # A plain flat index stores the original vectors; anything else has to be re-embedded
+    if isinstance(index, faiss.IndexFlat):
+        vectors = index.reconstruct_n(0, index.ntotal)
+    else:
+        vectors = np.asarray(embed_texts([c['text'] for c in chunk_store]), dtype=np.float32)
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(vectors), size=min(args.sample, len(vectors)), replace=False)
+    queries = np.vstack([
+        np.asarray(embed_texts(QUESTIONS, show_progress_bar=False), dtype=np.float32),
+        vectors[sample],
+    ])
+
+    exact = make_faiss_index(vectors.shape[1], reduce_dim=0, fp16=False)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{len(vectors)} vectors of {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"{'config':>16} | {'size':>9} | {'recall@k':>8} | {'p50 search':>10}")
+    for label, params in CONFIGS:
+        params = {"transform": "pca", "fp16": False, **params}
+        if params.get("reduce_dim") and len(vectors) < min_training_vectors(params["reduce_dim"], params["transform"]):
+            print(f"{label:>16} | skipped, too few vectors to train")
+            continue
+
+        candidate = make_faiss_index(vectors.shape[1], **params)
+        if not candidate.is_trained:
+            candidate.train(vectors)
+        candidate.add(vectors)
+
+        _, found = candidate.search(queries, args.k)
+
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            candidate.search(q[None, :], args.k)
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+        size_kb = len(faiss.serialize_index(candidate)) / 1024
+        print(f"{label:>16} | {size_kb:7.0f}KB | {recall_at_k(found, truth, args.k):8.3f} | {statistics.median(latencies):8.1f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# bench_rerank.py
+#
+# Compares plain dense retrieval against dense + cross-encoder rerank at the
+# same number of prompt chunks: retrieval latency, prompt size sent to the
+# LLM and relevance against a small hand-labelled set mapping each question
+# to the sections that answer it (precision@k and MRR).
+# Pass --generate to also time real completions.
+
+import argparse
+import statistics
+import time
+
+from transformers import AutoTokenizer
+
+from config import CACHE_PREFIX, RERANK_TOP_N
+from generation import get_backend
+from indexing import load_index
+from retrieval import retrieve_chunks, build_prompt, get_system_prompt
+
+SOCIAL_CONTRACT = "The Social Contract"
+POLITICAL_ECONOMY = "A Discourse on Political Economy"
+INEQUALITY = "A Discourse on the Origin and Basis of Inequality Among Men"
+SCIENCES_AND_ARTS = "A Discourse on the Sciences and Arts"
+
+# Question -> (source_title, section_title) pairs that answer it; None matches any section
+LABELS = {
+    "What is the general will?": [
+        (SOCIAL_CONTRACT, "WHETHER THE GENERAL WILL IS FALLIBLE"),
+        (SOCIAL_CONTRACT, "THAT THE GENERAL WILL IS INDESTRUCTIBLE"),
+        (SOCIAL_CONTRACT, "THAT SOVEREIGNTY IS INALIENABLE"),
+        (POLITICAL_ECONOMY, None),
+    ],
+    "Why does Rousseau think sovereignty cannot be represented?": [
+        (SOCIAL_CONTRACT, "DEPUTIES OR REPRESENTATIVES"),
+        (SOCIAL_CONTRACT, "THAT SOVEREIGNTY IS INALIENABLE"),
+    ],
+    "How did private property give rise to inequality?": [(INEQUALITY, "THE SECOND PART")],
+    "What was man like in the state of nature?": [(INEQUALITY, "THE FIRST PART")],
+    "What is the role of the legislator?": [(SOCIAL_CONTRACT, "THE LEGISLATOR")],
+    "Do the arts and sciences corrupt morals?": [(SCIENCES_AND_ARTS, None)],
+    "What distinguishes public economy from private economy?": [(POLITICAL_ECONOMY, None)],
+    "Under what conditions can a dictatorship be justified?": [(SOCIAL_CONTRACT, "THE DICTATORSHIP")],
+    "What is civil religion and why does the state need it?": [(SOCIAL_CONTRACT, "CIVIL RELIGION")],
+    "Can the right of the strongest create legitimate authority?": [
+        (SOCIAL_CONTRACT, "THE RIGHT OF THE STRONGEST"),
+        (SOCIAL_CONTRACT, "SLAVERY"),
+    ],
+    "What does man gain and lose in passing to the civil state?": [(SOCIAL_CONTRACT, "THE CIVIL STATE")],
+}
+
+QUESTIONS = list(LABELS)
+
+
+def is_relevant(question, metadata):
+
+    return any(
+        metadata.get('source_title') == source and section in (None, metadata.get('section_title'))
+        for source, section in LABELS[question]
+    )
+
+def relevance(question, hits, chunk_store):
+    """(precision@k, reciprocal rank of the first relevant chunk) for one question."""
+
+    relevant = [is_relevant(question, chunk_store[idx]['metadata']) for idx in hits]
+    precision = sum(relevant) / len(hits) if hits else 0.0
+    reciprocal_rank = next((1 / (rank + 1) for rank, r in enumerate(relevant) if r), 0.0)
+    return precision, reciprocal_rank
+
+def run(index, chunk_store, tokenizer, top_k, rerank, generate):
+
+    latencies, prompt_tokens, precisions, reciprocal_ranks, completions = [], [], [], [], []
+
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        hits = retrieve_chunks(question, index, chunk_store, top_k=top_k, rerank=rerank)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        prompt, _ = build_prompt(question, hits, chunk_store)
+        prompt_tokens.append(len(tokenizer.tokenize(prompt)))
+        precision, reciprocal_rank = relevance(question, hits, chunk_store)
+        precisions.append(precision)
+        reciprocal_ranks.append(reciprocal_rank)
+
+        if generate:
+            start = time.perf_counter()
+            get_backend().complete(get_system_prompt("understanding"), prompt)
+            completions.append((time.perf_counter() - start) * 1000)
+
+    label = "rerank" if rerank else "dense"
+    print(f"{label:>7} | retrieval {statistics.median(latencies):7.1f} ms (p50) "
+          f"| prompt {statistics.mean(prompt_tokens):7.0f} tokens "
+          f"| precision@{top_k} {statistics.mean(precisions):5.2f} | MRR {statistics.mean(reciprocal_ranks):5.2f}"
+          + (f" | completion {statistics.median(completions):7.1f} ms (p50)" if completions else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dense retrieval against cross-encoder reranking.")
+    parser.add_argument("--top-k", type=int, default=RERANK_TOP_N, help="Chunks sent to the LLM by both arms")
+    parser.add_argument("--generate", action="store_true", help="Also time LLM completions with the configured GENERATION_BACKEND")
+    args = parser.parse_args()
+
+    index, chunk_store = load_index(CACHE_PREFIX)
+    if index is None:
+        print("No index found. Please run `build_index.py` first.")
+        return
+
+    # The rerank arm keeps at most RERANK_TOP_N chunks; compare both arms at the same k
+    if args.top_k > RERANK_TOP_N:
+        print(f"--top-k capped at RERANK_TOP_N={RERANK_TOP_N} so both arms send the same number of chunks")
+        args.top_k = RERANK_TOP_N
+
+    tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased", use_fast=True)
+
+    # Warm both models so the first question does not pay the load time
+    retrieve_chunks("warm up", index, chunk_store, top_k=args.top_k, rerank=True)
+
+    print(f"{len(QUESTIONS)} questions, top_k={args.top_k}")
+    run(index, chunk_store, tokenizer, args.top_k, rerank=False, generate=args.generate)
+    run(index, chunk_store, tokenizer, args.top_k, rerank=True, generate=args.generate)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 # build_index.py
 
+import argparse
 import os
 from dotenv import load_dotenv
-from indexing import load_and_chunk_with_metadata, build_faiss_index, save_index, section_chunker
+from indexing import load_and_chunk_with_metadata, build_faiss_index, save_index, section_chunker, build_neighbor_graph, save_neighbor_graph
+from dedup import deduplicate_near, save_report
+from config import DEDUP_THRESHOLD, DEDUP_REPORT_PATH, CACHE_PREFIX, SHARD_DIR, QUERY_LOG_PATH, WARM_AFTER_BUILD
+from sharding import shard_name, save_shard
+from warm_cache import warm
 
 # Load .env in case you want to test locally
 load_dotenv()
@@ -10,111 +15,6 @@ load_dotenv()
 def get_sources():
     data_dir = "data"
     return [
-        {
-            "filepath": os.path.join(data_dir, "The Social Contract by John Jacques Rousseau.txt"),
-            "metadata": {
-                "source_title": "The Social Contract",
-                "author": "Jean-Jacques Rousseau",
-            },
-            "section_headers": [
-                "SUBJECT OF THE FIRST BOOK",
-                "THE FIRST SOCIETIES",
-                "THE RIGHT OF THE STRONGEST",
-                "SLAVERY",
-                "THAT WE MUST ALWAYS GO BACK TO A FIRST CONVENTION",
-                "THE SOCIAL COMPACT",
-                "THE SOVEREIGN",
-                "THE CIVIL STATE",
-                "REAL PROPERTY",
-                "BOOK",
-                "THAT SOVEREIGNTY IS INALIENABLE",
-                "THAT SOVEREIGNTY IS INDIVISIBLE",
-                "WHETHER THE GENERAL WILL IS FALLIBLE",
-                "THE LIMITS OF THE SOVEREIGN POWER",
-                "THE RIGHT OF LIFE AND DEATH",
-                "LAW",
-                "THE LEGISLATOR",
-                "THE PEOPLE",
-                "THE PEOPLE",
-                "THE PEOPLE",
-                "THE VARIOUS SYSTEMS OF LEGISLATION",
-                "THE DIVISION OF THE LAWS",
-                "BOOK",
-                "GOVERNMENT IN GENERAL",
-                "THE CONSTITUENT PRINCIPLE IN THE VARIOUS FORMS OF GOVERNMENT",
-                "THE DIVISION OF GOVERNMENTS",
-                "DEMOCRACY",
-                "ARISTOCRACY",
-                "MONARCHY",
-                "MIXED GOVERNMENTS",
-                "THAT ALL FORMS OF GOVERNMENT DO NOT SUIT ALL COUNTRIES",
-                "THE MARKS OF A GOOD GOVERNMENT",
-                "THE ABUSE OF GOVERNMENT AND ITS TENDENCY TO DEGENERATE",
-                "THE DEATH OF THE BODY POLITIC",
-                "HOW THE SOVEREIGN AUTHORITY MAINTAINS ITSELF",
-                "DEPUTIES OR REPRESENTATIVES",
-                "THAT THE INSTITUTION OF GOVERNMENT IS NOT A CONTRACT",
-                "THE INSTITUTION OF GOVERNMENT",
-                "HOW TO CHECK THE USURPATIONS OF GOVERNMENT",
-                "BOOK",
-                "THAT THE GENERAL WILL IS INDESTRUCTIBLE",
-                "VOTING",
-                "ELECTIONS",
-                "THE ROMAN COMITIA",
-                "THE TRIBUNATE",
-                "THE DICTATORSHIP",
-                "THE CENSORSHIP",
-                "CIVIL RELIGION",
-                "CONCLUSION"
-            ]
-        },
-                {
-            "filepath": os.path.join(data_dir, "A Discourse on Political Economy by John Jacques Rousseau.txt"),
-            "metadata": {
-                "source_title": "A Discourse on Political Economy",
-                "author": "Jean-Jacques Rousseau",
-            },
-            "section_headers": [
-                    "A DISCOURSE ON POLITICAL ECONOMY",
-                ]
-        },
-                {
-            "filepath": os.path.join(data_dir, "A Discourse on the Origin and Basis of Inequality Among Men by John Jacques Rousseau .txt"),
-            "metadata": {
-                "source_title": "A Discourse on the Origin and Basis of Inequality Among Men",
-                "author": "Jean-Jacques Rousseau",
-            },
-                "section_headers": [
-                    "A DISCOURSE ON THE ORIGIN OF INEQUALITY",
-                    "A DISSERTATION ON THE ORIGIN AND FOUNDATION OF THE INEQUALITY OF MANKIND",
-                    "THE FIRST PART",
-                    "THE SECOND PART",
-                ]
-        },
-                {
-            "filepath": os.path.join(data_dir, "A Discourse on the Sciences and Arts by John Jacques Rousseau .txt"),
-            "metadata": {
-                "source_title": "A Discourse on the Sciences and Arts by John Jacques Rousseau",
-                "author": "Jean-Jacques Rousseau",
-            },
-
-            "section_headers": [
-                    "A DISCOURSE ON THE ARTS AND SCIENCES",
-                    "PREFACE",
-                    "MORAL EFFECTS OF THE ARTS AND SCIENCES",
-                    "THE FIRST PART",
-                    "THE SECOND PART",
-
-
-                ]
-        },
-    ]
-
-def main():
-    print("📚 Building index for Rousseau...")
-
-    data_dir = "data"
-    sources = [
         {
             "filepath": os.path.join(data_dir, "The Social Contract by John Jacques Rousseau.txt"),
             "metadata": {
@@ -215,6 +115,9 @@ def main():
         },
     ]
 
+def build_chunks(sources, report_path):
+    """Chunk the sources and drop exact and near-duplicate chunks."""
+
     all_chunks = []
 
     for src in sources:
@@ -228,9 +131,8 @@ def main():
         all_chunks.extend(chunks)
 
     if not all_chunks:
-        print("❌ No chunks found. Exiting.")
-        return
-    
+        return []
+
 
     print("\nStarting de-duplication process...")
     unique_chunks_list = []
@@ -247,17 +149,77 @@ def main():
     print(f"\nOriginal chunk count: {len(all_chunks)}")
     print(f"Unique chunk count after de-duplication: {len(unique_chunks_list)}")
 
+    print(f"\nRemoving near-duplicates (Jaccard >= {DEDUP_THRESHOLD})...")
+    unique_chunks_list, dedup_report = deduplicate_near(unique_chunks_list, threshold=DEDUP_THRESHOLD)
+    save_report(dedup_report, report_path)
+
+    print(f"Merged {len(dedup_report['clusters'])} near-duplicate clusters, report saved to {report_path}")
+    print(f"Chunk count after near-duplicate removal: {len(unique_chunks_list)}")
 
+    return unique_chunks_list
 
-    index, chunk_store = build_faiss_index(unique_chunks_list)
+def build_monolith(sources):
 
+    chunks = build_chunks(sources, DEDUP_REPORT_PATH)
 
+    if not chunks:
+        print("❌ No chunks found. Exiting.")
+        return
+
+    index, chunk_store = build_faiss_index(chunks)
 
     if index is not None and chunk_store is not None:
-        save_index(index, chunk_store, filename_prefix="rousseau_works")
+        save_index(index, chunk_store, filename_prefix=CACHE_PREFIX)
         print(f"✅ Saved index and metadata for {len(chunk_store)} chunks.")
+
+        neighbor_ids, neighbor_distances = build_neighbor_graph(index)
+        save_neighbor_graph(neighbor_ids, neighbor_distances, filename_prefix=CACHE_PREFIX)
+        print(f"✅ Saved {neighbor_ids.shape[1]}-nearest-neighbor graph.")
     else:
         print("❌ Failed to build index.")
 
+def build_shards(sources, only=None):
+    """Build one shard per source; `only` limits the rebuild to those shard names."""
+
+    os.makedirs(SHARD_DIR, exist_ok=True)
+
+    for src in sources:
+        name = shard_name(src["metadata"])
+        if only and name not in only:
+            continue
+
+        print(f"\n📦 Building shard '{name}'...")
+        chunks = build_chunks([src], os.path.join(SHARD_DIR, f"{name}_dedup_report.json"))
+
+        if not chunks:
+            print(f"❌ No chunks found for shard '{name}'. Skipping.")
+            continue
+
+        index, chunk_store = build_faiss_index(chunks)
+        save_shard(name, index, chunk_store, src["metadata"])
+        neighbor_ids, neighbor_distances = build_neighbor_graph(index)
+        save_neighbor_graph(neighbor_ids, neighbor_distances, filename_prefix=os.path.join(SHARD_DIR, name))
+        print(f"✅ Saved shard '{name}' with {len(chunk_store)} chunks.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the PhilQuery index.")
+    parser.add_argument("--sharded", action="store_true", help="Build one shard per source instead of a single index")
+    parser.add_argument("--only", nargs="+", metavar="SHARD", help="With --sharded, rebuild only these shards")
+    parser.add_argument("--no-warm", action="store_true", help="Skip warming the answer cache from the query log")
+    args = parser.parse_args()
+
+    print("📚 Building index for Rousseau...")
+
+    sources = get_sources()
+
+    if args.sharded:
+        build_shards(sources, only=args.only)
+    else:
+        build_monolith(sources)
+
+    # Pre-answer the most frequent logged questions against the new index
+    if WARM_AFTER_BUILD and not args.no_warm and os.path.exists(QUERY_LOG_PATH):
+        warm()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
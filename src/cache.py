@@ -0,0 +1,81 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used cache."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def answer_cache_key(corpus, query, mode, chunk_count, rerank=None, sources=None):
+    """Key of an /ask response in the answer cache; queries match case- and whitespace-insensitively."""
+    return (corpus, " ".join(query.lower().split()), mode, chunk_count, rerank, tuple(sources or ()))
+
+def save_answer_cache(entries, path, fingerprints=None):
+    """Write {key: response} answer cache entries, e.g. from the warm-up job.
+
+    `fingerprints` maps each corpus to `CorpusManager.fingerprint` of the
+    build the answers were generated from.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"fingerprints": fingerprints or {}, "entries": entries}, f)
+    os.replace(tmp, path)
+
+def load_answer_cache(path, fingerprint=None):
+    """Read answer cache entries written by `save_answer_cache`.
+
+    With a `fingerprint(corpus)` function, entries of corpora rebuilt since
+    the cache was written are dropped: their chunk ids and citations point
+    into a chunk store that no longer exists.
+    """
+    try:
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+    except FileNotFoundError:
+        return {}
+
+    entries = saved.get("entries", {})
+    if fingerprint is None:
+        return entries
+
+    fingerprints = saved.get("fingerprints", {})
+    current = {corpus: fingerprint(corpus) for corpus in {key[0] for key in entries}}
+    return {
+        key: response for key, response in entries.items()
+        if current[key[0]] is not None and fingerprints.get(key[0]) == current[key[0]]
+    }
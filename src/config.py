@@ -1,6 +1,5 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 
 load_dotenv()
 
@@ -8,7 +7,99 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 DATA_DIR = "data"
 CACHE_PREFIX = "rousseau_works"
 
-client = OpenAI(
-    api_key=GROQ_API_KEY,
-    base_url="https://api.groq.com/openai/v1"
-)
\ No newline at end of file
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+# Generation backend: "groq", "local" (any OpenAI-compatible server) or "stub" (offline, deterministic)
+GENERATION_BACKEND = os.getenv("GENERATION_BACKEND", "groq").lower()
+GENERATION_MODEL = os.getenv("GENERATION_MODEL", "llama-3.1-8b-instant")
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://localhost:8080/v1")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "not-needed")
+STUB_TTFT_MS = float(os.getenv("STUB_TTFT_MS", "300"))
+STUB_TOKENS_PER_SEC = float(os.getenv("STUB_TOKENS_PER_SEC", "250"))
+STUB_MAX_TOKENS = int(os.getenv("STUB_MAX_TOKENS", "400"))
+
+# Two-stage retrieval: wide FAISS candidate set, cross-encoder rerank, few chunks to the LLM
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "250"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "512"))
+
+# Streamlit apps call this FastAPI service when set, instead of loading the index in-process
+PHILQUERY_API_URL = os.getenv("PHILQUERY_API_URL")
+
+# Near-duplicate removal at build time (MinHash + LSH)
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+DEDUP_REPORT_PATH = os.getenv("DEDUP_REPORT_PATH", "rousseau_works_dedup_report.json")
+
+# Sharded layout: one index per source under SHARD_DIR, searched in parallel
+SHARD_DIR = os.getenv("SHARD_DIR", "shards")
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "0"))  # 0 = one thread per shard
+SHARD_REMOTES = os.getenv("SHARD_REMOTES", "")  # e.g. "the_social_contract=127.0.0.1:7001"
+SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY", "")  # required for shard RPC; use a long random secret
+SHARD_RPC_TIMEOUT_S = float(os.getenv("SHARD_RPC_TIMEOUT_S", "10"))
+
+# Micro-batching of concurrent query encodes and searches in the API server
+BATCH_ENABLED = os.getenv("BATCH_ENABLED", "true").lower() == "true"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# Extractive mode: local sentence highlighting, no LLM call
+EXTRACTIVE_MAX_HIGHLIGHTS = int(os.getenv("EXTRACTIVE_MAX_HIGHLIGHTS", "5"))
+EXTRACTIVE_MIN_SENTENCE_CHARS = int(os.getenv("EXTRACTIVE_MIN_SENTENCE_CHARS", "25"))
+
+# Multi-corpus hosting: corpora are loaded on first use and evicted LRU under a memory budget
+DEFAULT_CORPUS = os.getenv("DEFAULT_CORPUS", CACHE_PREFIX)
+CORPORA_DIR = os.getenv("CORPORA_DIR", ".")
+CORPUS_MEMORY_BUDGET_MB = float(os.getenv("CORPUS_MEMORY_BUDGET_MB", "2048"))
+CORPUS_PREFETCH_TOP = int(os.getenv("CORPUS_PREFETCH_TOP", "3"))
+CORPUS_TRAFFIC_WINDOW = int(os.getenv("CORPUS_TRAFFIC_WINDOW", "500"))
+
+# Background job queue for long answers (POST /jobs, GET /jobs/{id})
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MODE_LIMITS = {
+    mode: int(limit) for mode, limit in
+    (item.split("=") for item in os.getenv("JOB_MODE_LIMITS", "understanding=2,retrieval=4,extractive=4").split(","))
+}
+JOB_MODE_PRIORITIES = {  # lower runs first
+    mode: int(priority) for mode, priority in
+    (item.split("=") for item in os.getenv("JOB_MODE_PRIORITIES", "extractive=0,retrieval=0,understanding=10").split(","))
+}
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+JOB_RESULT_TTL_S = float(os.getenv("JOB_RESULT_TTL_S", "3600"))
+JOB_MAX_RETAINED = int(os.getenv("JOB_MAX_RETAINED", "1000"))
+
+# Admission control for /ask: bounded per-mode queues in front of a cap on in-flight LLM calls
+ADMISSION_MAX_INFLIGHT_LLM = int(os.getenv("ADMISSION_MAX_INFLIGHT_LLM", "8"))
+ADMISSION_MAX_QUEUE = {
+    mode: int(size) for mode, size in
+    (item.split("=") for item in os.getenv("ADMISSION_MAX_QUEUE", "understanding=8,retrieval=16").split(","))
+}
+ADMISSION_QUEUE_TIMEOUT_S = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "10"))
+ADMISSION_DEGRADE_AT = float(os.getenv("ADMISSION_DEGRADE_AT", "0.5"))  # fraction of a mode's queue in use
+ADMISSION_DEGRADE = os.getenv("ADMISSION_DEGRADE", "extractive")  # "extractive" or "fewer_chunks"
+ADMISSION_DEGRADED_CHUNK_COUNT = int(os.getenv("ADMISSION_DEGRADED_CHUNK_COUNT", "2"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+
+# Passage neighbor graph precomputed by build_index for /chunks/{id}/related
+NEIGHBOR_K = int(os.getenv("NEIGHBOR_K", "10"))
+
+# Optional index compression at build time: PCA/OPQ to INDEX_REDUCE_DIM dims (0 = off), float16 storage
+INDEX_REDUCE_DIM = int(os.getenv("INDEX_REDUCE_DIM", "0"))
+INDEX_TRANSFORM = os.getenv("INDEX_TRANSFORM", "pca")  # "pca" or "opq"
+INDEX_OPQ_M = int(os.getenv("INDEX_OPQ_M", "8"))
+INDEX_FP16 = os.getenv("INDEX_FP16", "false").lower() == "true"
+
+# Query log (JSON lines, rotated, written off the request path) and offline cache warm-up
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", os.path.join("logs", "queries.jsonl"))
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+QUERY_LOG_BACKUPS = int(os.getenv("QUERY_LOG_BACKUPS", "5"))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "answer_cache.pkl")
+WARM_TOP_N = int(os.getenv("WARM_TOP_N", "50"))
+WARM_SIMILARITY = float(os.getenv("WARM_SIMILARITY", "0.92"))
+WARM_AFTER_BUILD = os.getenv("WARM_AFTER_BUILD", "true").lower() == "true"
@@ -0,0 +1,356 @@
+# corpora.py
+#
+# Multi-corpus hosting. A CorpusManager loads a corpus (index + chunk store)
+# the first time a request names it, keeps recently used corpora resident
+# under a memory budget, evicts the least recently used ones, and prefetches
+# corpora that are popular in recent traffic when there is room for them.
+#
+# Under CORPORA_DIR a corpus named `name` is either a single index
+# (`name.index` + `name_chunk_store.pkl`) or a sharded one (`name/manifest.json`).
+
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import (
+    DEFAULT_CORPUS, SHARD_DIR, BATCH_ENABLED,
+    CORPUS_MEMORY_BUDGET_MB, CORPUS_PREFETCH_TOP, CORPUS_TRAFFIC_WINDOW
+)
+from indexing import load_index, load_neighbor_graph
+from sharding import MANIFEST, load_sharded_index, load_sharded_neighbors
+from batching import QueryBatcher
+
+_VALID_NAME = re.compile(r"^[A-Za-z0-9_\-]+$")
+_MB = 1024 * 1024
+_LOOKUP_TTL_S = 30.0  # how long a corpus's location and on-disk size are reused
+_PREFETCH_CHECK_INTERVAL_S = 1.0
+
+
+class CorpusNotFound(KeyError):
+    pass
+
+
+class Corpus:
+
+    def __init__(self, name, index, chunks, size_bytes, load_ms, batcher=None, neighbors=(None, None), build=None):
+        self.name = name
+        # `CorpusManager.fingerprint` of the files this corpus was loaded from
+        self.build = build
+        self.index = index
+        self.chunks = chunks
+        # Precomputed (ids, distances) k-NN graph, or (None, None) if not built
+        self.neighbor_ids, self.neighbor_distances = neighbors
+        self.size_bytes = size_bytes
+        self.load_ms = load_ms
+        self.batcher = batcher
+        self.requests = 0
+        self.last_used = time.time()
+        self._source_titles = None
+
+    def source_view(self, source_titles):
+        """An index-like object that only returns chunks from the given source titles.
+
+        For single-index corpora; sharded ones route to per-source shards instead.
+        """
+        if self._source_titles is None:
+            self._source_titles = np.array([c['metadata'].get('source_title') for c in self.chunks], dtype=object)
+        return SourceView(self.index, np.isin(self._source_titles, list(source_titles)))
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+
+class SourceView:
+    """Searches a whole index and keeps only the hits allowed by a per-chunk mask.
+
+    Over-fetches, widening the search until k allowed hits are found or the
+    whole index has been searched.
+    """
+
+    def __init__(self, index, allowed):
+        self.index = index
+        self.allowed = allowed
+        self.ntotal = int(allowed.sum())
+
+    def search(self, x, k):
+        D = np.full((len(x), k), np.inf, dtype=np.float32)
+        I = np.full((len(x), k), -1, dtype=np.int64)
+
+        for row in range(len(x)):
+            fetch = k
+            while True:
+                fetch = min(fetch * 4, self.index.ntotal)
+                row_D, row_I = self.index.search(x[row:row + 1], fetch)
+                keep = (row_I[0] >= 0) & self.allowed[np.maximum(row_I[0], 0)]
+                if keep.sum() >= k or fetch >= self.index.ntotal:
+                    break
+            hits = np.flatnonzero(keep)[:k]
+            D[row, :len(hits)] = row_D[0, hits]
+            I[row, :len(hits)] = row_I[0, hits]
+
+        return D, I
+
+
+class CorpusManager:
+
+    def __init__(self, root, memory_budget_mb=CORPUS_MEMORY_BUDGET_MB, prefetch_top=CORPUS_PREFETCH_TOP,
+                 traffic_window=CORPUS_TRAFFIC_WINDOW, batching=BATCH_ENABLED, remotes=None):
+        self.root = root
+        self.budget_bytes = int(memory_budget_mb * _MB)
+        self.prefetch_top = prefetch_top
+        self.batching = batching
+        self.remotes = remotes or {}
+
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._traffic = deque(maxlen=traffic_window)
+        self._cold_loads = deque(maxlen=50)
+        self._evictions = 0
+        self._prefetching = set()
+        self._found = {}  # name -> (location, size_bytes, checked_at) for corpora that exist
+        self._last_prefetch_check = 0.0
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="corpus-prefetch")
+
+    def _locate(self, name):
+        """Return ("sharded", directory) or ("single", prefix) for a corpus, or None."""
+        if not _VALID_NAME.match(name):
+            return None
+
+        candidates = [("sharded", os.path.join(self.root, name))]
+        if name == DEFAULT_CORPUS:
+            candidates.insert(0, ("sharded", os.path.join(self.root, SHARD_DIR)))
+
+        for layout, path in candidates:
+            if os.path.exists(os.path.join(path, MANIFEST)):
+                return layout, path
+
+        prefix = os.path.join(self.root, name)
+        if os.path.exists(f"{prefix}.index") and os.path.exists(f"{prefix}_chunk_store.pkl"):
+            return "single", prefix
+
+        return None
+
+    def _files(self, location):
+        """Files a corpus is loaded from."""
+        layout, path = location
+        if layout == "single":
+            files = [f"{path}.index", f"{path}_chunk_store.pkl", f"{path}_neighbors.npz"]
+            return [f for f in files if os.path.exists(f)]
+        return [
+            os.path.join(path, f)
+            for f in sorted(os.listdir(path)) if f.endswith((".index", ".pkl", ".npz")) or f == MANIFEST
+        ]
+
+    def _estimate_bytes(self, location):
+        """On-disk size of a corpus, used as its memory footprint."""
+        return sum(os.path.getsize(f) for f in self._files(location))
+
+    def build(self, name):
+        """Fingerprint of the build requests for `name` are answered from.
+
+        That of the resident corpus when loaded (no file access), otherwise
+        that of the files on disk; None if there is no such corpus.
+        """
+        with self._lock:
+            corpus = self._resident.get(name)
+        if corpus is not None:
+            return corpus.build
+        return self.fingerprint(name)
+
+    def _lookup(self, name):
+        """(location, size_bytes) of corpus `name`, or None if there is none.
+
+        Hits are cached for a while so the hot path does not stat corpus
+        files on every request; misses are not cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            found = self._found.get(name)
+        if found is not None and now - found[2] < _LOOKUP_TTL_S:
+            return found[0], found[1]
+
+        location = self._locate(name)
+        if location is None:
+            with self._lock:
+                self._found.pop(name, None)
+            return None
+
+        size = self._estimate_bytes(location)
+        with self._lock:
+            self._found[name] = (location, size, now)
+        return location, size
+
+    def fingerprint(self, name):
+        """Identifies the corpus files currently on disk (names, sizes, mtimes); None if not found.
+
+        Changes whenever the corpus is rebuilt, so data derived from an older
+        build (e.g. warmed answers) can be detected and dropped.
+        """
+        location = self._locate(name)
+        if location is None:
+            return None
+        return tuple(
+            (os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns) for f in self._files(location)
+        )
+
+    def available(self):
+        """Names of all corpora that can be served."""
+        names = set()
+        for entry in os.listdir(self.root):
+            if entry.endswith(".index"):
+                names.add(entry[:-len(".index")])
+            elif os.path.isdir(os.path.join(self.root, entry)):
+                names.add(entry)
+        if self._locate(DEFAULT_CORPUS):
+            names.add(DEFAULT_CORPUS)
+        return sorted(n for n in names if n != SHARD_DIR and self._locate(n))
+
+    def get(self, name):
+        """Return the resident corpus `name`, loading it on first use.
+
+        Raises CorpusNotFound for names with no corpus on disk; those are
+        not counted as traffic.
+        """
+        with self._lock:
+            corpus = self._resident.get(name)
+            if corpus is not None:
+                self._resident.move_to_end(name)
+                self._traffic.append(name)
+
+        if corpus is None:
+            found = self._lookup(name)
+            if found is None:
+                raise CorpusNotFound(name)
+            with self._lock:
+                self._traffic.append(name)
+            corpus = self._load(name, found[0])
+
+        corpus.requests += 1
+        corpus.last_used = time.time()
+        self._schedule_prefetch()
+
+        return corpus
+
+    def _load(self, name, location, prefetch=False):
+        """Load corpus `name` from an existing `location` (see `_locate`)."""
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # One loader per corpus; concurrent requests for it wait and share the result
+        with load_lock:
+            with self._lock:
+                if name in self._resident:
+                    return self._resident[name]
+
+            build = self.fingerprint(name)
+            start = time.perf_counter()
+            if location[0] == "sharded":
+                remotes = self.remotes if name == DEFAULT_CORPUS else None
+                index, chunks = load_sharded_index(location[1], remotes=remotes)
+                neighbors = load_sharded_neighbors(index, location[1]) if index is not None else (None, None)
+            else:
+                index, chunks = load_index(location[1])
+                neighbors = load_neighbor_graph(location[1])
+            if index is None:
+                raise RuntimeError(f"Could not load corpus '{name}'")
+            load_ms = (time.perf_counter() - start) * 1000
+
+            batcher = QueryBatcher(index) if self.batching else None
+            corpus = Corpus(name, index, chunks, self._estimate_bytes(location), load_ms, batcher, neighbors, build)
+
+            with self._lock:
+                self._resident[name] = corpus
+                self._cold_loads.append({"corpus": name, "ms": round(load_ms, 1), "at": time.time(), "prefetch": prefetch})
+                evicted = self._evict(keep=name)
+
+        for old in evicted:
+            old.close()
+
+        return corpus
+
+    def _evict(self, keep):
+        """Drop least recently used corpora until the budget fits. Caller holds the lock."""
+        evicted = []
+        while self._resident_bytes() > self.budget_bytes and len(self._resident) > 1:
+            name = next(n for n in self._resident if n != keep)
+            evicted.append(self._resident.pop(name))
+            self._evictions += 1
+        return evicted
+
+    def _resident_bytes(self):
+        return sum(c.size_bytes for c in self._resident.values())
+
+    def _schedule_prefetch(self):
+        """Load popular non-resident corpora in the background if they fit in the free budget.
+
+        Runs at most once per _PREFETCH_CHECK_INTERVAL_S; corpus sizes come
+        from the lookup cache and are read outside the manager lock.
+        """
+        if self.prefetch_top <= 0:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prefetch_check < _PREFETCH_CHECK_INTERVAL_S:
+                return
+            self._last_prefetch_check = now
+            popular = [
+                name for name, _ in Counter(self._traffic).most_common(self.prefetch_top)
+                if name not in self._resident and name not in self._prefetching
+            ]
+
+        candidates = [(name, self._lookup(name)) for name in popular]
+
+        with self._lock:
+            free = self.budget_bytes - self._resident_bytes()
+            for name, found in candidates:
+                if found is None or name in self._resident or name in self._prefetching:
+                    continue
+                location, size = found
+                if size > free:
+                    continue
+                free -= size
+                self._prefetching.add(name)
+                self._prefetcher.submit(self._prefetch, name, location)
+
+    def _prefetch(self, name, location):
+
+        try:
+            self._load(name, location, prefetch=True)
+        except Exception as e:
+            print(f"Warning: prefetch of corpus '{name}' failed: {e}")
+        finally:
+            with self._lock:
+                self._prefetching.discard(name)
+
+    def stats(self):
+
+        with self._lock:
+            return {
+                "budget_mb": round(self.budget_bytes / _MB, 1),
+                "resident_mb": round(self._resident_bytes() / _MB, 1),
+                # Least recently used first
+                "resident": [
+                    {
+                        "corpus": c.name,
+                        "size_mb": round(c.size_bytes / _MB, 1),
+                        "vectors": c.index.ntotal,
+                        "requests": c.requests,
+                        "last_used": c.last_used,
+                        "load_ms": round(c.load_ms, 1),
+                    }
+                    for c in self._resident.values()
+                ],
+                "cold_loads": list(self._cold_loads),
+                "evictions": self._evictions,
+                "prefetching": sorted(self._prefetching),
+                "recent_traffic": dict(Counter(self._traffic).most_common(10)),
+            }
@@ -0,0 +1,165 @@
+# dedup.py
+#
+# Near-duplicate chunk detection for the build pipeline: word shingles,
+# MinHash signatures and LSH banding, vectorized with NumPy. Runs in roughly
+# linear time in the number of chunks.
+
+import json
+import zlib
+import numpy as np
+
+from config import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE
+
+# Mersenne prime below 2**31, so (a * x + b) never overflows uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def shingle_hashes(text, shingle_size=DEDUP_SHINGLE_SIZE):
+    """Hash the word `shingle_size`-grams of a text to 32-bit integers."""
+    words = text.lower().split()
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+
+    count = max(1, len(words) - shingle_size + 1)
+    shingles = (" ".join(words[i:i + shingle_size]) for i in range(count))
+
+    return np.unique(np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=count))
+
+def minhash_signatures(texts, num_perm=DEDUP_NUM_PERM, shingle_size=DEDUP_SHINGLE_SIZE, seed=1, block_size=250_000):
+    """Return an (n_texts, num_perm) uint64 matrix of MinHash signatures.
+
+    Texts are processed in blocks of roughly `block_size` shingles so the
+    (shingles x num_perm) matrix stays bounded for large corpora. Empty texts
+    get a signature of all `_PRIME`, which matches nothing real.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    hashes = [shingle_hashes(t, shingle_size) % _PRIME for t in texts]
+    lengths = np.array([len(h) for h in hashes], dtype=np.int64)
+    signatures = np.full((len(texts), num_perm), _PRIME, dtype=np.uint64)
+
+    start = 0
+    while start < len(texts):
+        end, total = start, 0
+        while end < len(texts) and (end == start or total + lengths[end] <= block_size):
+            total += lengths[end]
+            end += 1
+
+        rows = np.arange(start, end)[lengths[start:end] > 0]
+        if len(rows):
+            flat = np.concatenate([hashes[i] for i in rows])
+            offsets = np.concatenate(([0], np.cumsum(lengths[rows])[:-1]))
+            permuted = (flat[:, None] * a + b) % _PRIME
+            signatures[rows] = np.minimum.reduceat(permuted, offsets, axis=0)
+
+        start = end
+
+    return signatures
+
+def lsh_params(threshold, num_perm):
+    """Pick (bands, rows) whose S-curve threshold (1/b)^(1/r) is closest to `threshold`."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+
+    return best[1], best[2]
+
+def near_duplicate_clusters(signatures, threshold=DEDUP_THRESHOLD, valid=None):
+    """Group signatures whose estimated Jaccard similarity is at least `threshold`.
+
+    Within each LSH bucket every member is compared to the bucket's first
+    member only, which keeps the work linear; the bands give each pair many
+    chances to meet. Returns {representative: [(member, similarity), ...]},
+    where the representative is the lowest index of its cluster.
+    """
+    n, num_perm = signatures.shape
+    bands, rows = lsh_params(threshold, num_perm)
+    candidates = np.arange(n) if valid is None else np.flatnonzero(valid)
+
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    mixers = np.random.default_rng(0).integers(1, np.iinfo(np.int64).max, size=rows, dtype=np.uint64) | np.uint64(1)
+
+    for band in range(bands):
+        # uint64 arithmetic wraps, which is fine for a bucket key
+        keys = (signatures[candidates, band * rows:(band + 1) * rows] * mixers).sum(axis=1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(order)]))
+
+        for s, e in zip(starts, ends):
+            if e - s < 2:
+                continue
+            bucket = candidates[order[s:e]]
+            first, members = bucket[0], bucket[1:]
+            similar = (signatures[members] == signatures[first]).mean(axis=1) >= threshold
+            for m in members[similar]:
+                ra, rb = find(int(first)), find(int(m))
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+
+    clusters = {}
+    for i in candidates:
+        root = find(int(i))
+        if root != i:
+            sim = float((signatures[i] == signatures[root]).mean())
+            clusters.setdefault(root, []).append((int(i), sim))
+
+    return clusters
+
+def deduplicate_near(chunks, threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM, shingle_size=DEDUP_SHINGLE_SIZE):
+    """Drop near-duplicate chunks, keeping the first of each cluster.
+
+    Returns the surviving chunks in their original order and a report of
+    the merged clusters.
+    """
+    texts = [c.get('text', '') for c in chunks]
+    signatures = minhash_signatures(texts, num_perm=num_perm, shingle_size=shingle_size)
+    valid = np.array([bool(t.strip()) for t in texts], dtype=bool)
+    clusters = near_duplicate_clusters(signatures, threshold=threshold, valid=valid)
+
+    dropped = {m for members in clusters.values() for m, _ in members}
+    unique_chunks = [c for i, c in enumerate(chunks) if i not in dropped]
+
+    def describe(i):
+        return {
+            "index": i,
+            "source_title": chunks[i].get('metadata', {}).get('source_title'),
+            "section_title": chunks[i].get('metadata', {}).get('section_title'),
+            "excerpt": texts[i][:120].strip(),
+        }
+
+    report = {
+        "threshold": threshold,
+        "num_perm": num_perm,
+        "shingle_size": shingle_size,
+        "input_chunks": len(chunks),
+        "output_chunks": len(unique_chunks),
+        "clusters": [
+            {
+                "kept": describe(root),
+                "merged": [{**describe(m), "similarity": round(sim, 3)} for m, sim in members],
+            }
+            for root, members in sorted(clusters.items())
+        ],
+    }
+
+    return unique_chunks, report
+
+def save_report(report, path):
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
@@ -1,9 +1,21 @@
 import os
+import threading
 from sentence_transformers import SentenceTransformer
 
+_embedder = None
+_lock = threading.Lock()
 
-def embed_texts(texts):
 
-    embedder = SentenceTransformer("all-MiniLM-L6-v2")
-    
-    return embedder.encode(texts, show_progress_bar=True)
\ No newline at end of file
+def get_embedder():
+
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                _embedder = SentenceTransformer("all-MiniLM-L6-v2")
+
+    return _embedder
+
+def embed_texts(texts, show_progress_bar=True):
+
+    return get_embedder().encode(texts, show_progress_bar=show_progress_bar)
@@ -0,0 +1,89 @@
+# extractive.py
+#
+# LLM-free "extractive" mode: split the retrieved chunks into sentences,
+# embed them in one batch, score them against the question embedding from
+# retrieval, and return the best matching sentences with their character
+# offsets as highlights.
+
+import re
+import numpy as np
+
+from config import EXTRACTIVE_MAX_HIGHLIGHTS, EXTRACTIVE_MIN_SENTENCE_CHARS
+from embedder import embed_texts
+
+# A sentence runs up to terminal punctuation plus any closing quotes/brackets
+_SENTENCE = re.compile(r"[^.!?]+(?:[.!?]+[\"'”’)\]]*|$)")
+
+
+def split_sentences(text, min_chars=EXTRACTIVE_MIN_SENTENCE_CHARS):
+    """Return (start, end) character offsets of the sentences in `text`."""
+    spans = []
+    for match in _SENTENCE.finditer(text):
+        start, end = match.span()
+        # Trim surrounding whitespace without losing the offsets
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end - start >= min_chars:
+            spans.append((start, end))
+    return spans
+
+def extract_highlights(question, hits, chunk_store, max_highlights=EXTRACTIVE_MAX_HIGHLIGHTS, question_embedding=None):
+    """Rank the sentences of the retrieved chunks against the question.
+
+    Returns up to `max_highlights` dicts, best first, each with the chunk id,
+    the source number (its 1-based position in `hits`), the sentence, its
+    character offsets in the chunk text, the cosine score and the source
+    metadata. Pass the `question_embedding` computed by retrieval to avoid
+    encoding the question again.
+    """
+    candidates = []
+    for rank, idx in enumerate(hits):
+        text = chunk_store[idx]['text']
+        spans = split_sentences(text) or [(0, len(text))]
+        candidates.extend((rank, idx, start, end) for start, end in spans)
+
+    if not candidates:
+        return []
+
+    texts = [chunk_store[idx]['text'][start:end] for _, idx, start, end in candidates]
+    if question_embedding is None:
+        embeddings = np.asarray(embed_texts([question] + texts, show_progress_bar=False), dtype=np.float32)
+    else:
+        sentences = np.asarray(embed_texts(texts, show_progress_bar=False), dtype=np.float32)
+        embeddings = np.vstack([np.asarray(question_embedding, dtype=np.float32).reshape(1, -1), sentences])
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+    scores = embeddings[1:] @ embeddings[0]
+
+    highlights = []
+    for i in np.argsort(-scores)[:max_highlights]:
+        rank, idx, start, end = candidates[i]
+        meta = chunk_store[idx]['metadata']
+        highlights.append({
+            "chunk_id": idx,
+            "source": rank + 1,
+            "text": texts[i],
+            "start": start,
+            "end": end,
+            "score": float(scores[i]),
+            "source_title": meta.get('source_title'),
+            "author": meta.get('author'),
+            "section_title": meta.get('section_title'),
+        })
+
+    return highlights
+
+def format_highlights(highlights):
+    """Markdown answer body for extractive mode."""
+    if not highlights:
+        return "No directly relevant passages found."
+
+    parts = []
+    for h in highlights:
+        heading = h['source_title'] or "Unknown source"
+        if h['section_title']:
+            heading += f" — {h['section_title'].title()}"
+        parts.append(f"**{heading}** [{h['source']}]\n\n> {h['text']}")
+
+    return "\n\n".join(parts)
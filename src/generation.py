@@ -0,0 +1,108 @@
+import hashlib
+import random
+import time
+from openai import OpenAI
+
+from config import (
+    GROQ_API_KEY, GROQ_BASE_URL, GENERATION_BACKEND, GENERATION_MODEL,
+    LOCAL_LLM_BASE_URL, LOCAL_LLM_API_KEY,
+    STUB_TTFT_MS, STUB_TOKENS_PER_SEC, STUB_MAX_TOKENS
+)
+
+
+class GenerationBackend:
+    """Chat completion backend used by `retrieval.ask_question`."""
+
+    def stream(self, system_prompt, prompt, temperature=0.2):
+        """Yield the answer as text fragments."""
+        raise NotImplementedError
+
+    def complete(self, system_prompt, prompt, temperature=0.2):
+
+        return "".join(self.stream(system_prompt, prompt, temperature=temperature)).strip()
+
+
+class OpenAICompatibleBackend(GenerationBackend):
+    """Groq, or any local server speaking the OpenAI chat completions API."""
+
+    def __init__(self, base_url, api_key, model):
+        self.model = model
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+
+    def _messages(self, system_prompt, prompt):
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    def complete(self, system_prompt, prompt, temperature=0.2):
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system_prompt, prompt),
+            temperature=temperature
+        )
+        return response.choices[0].message.content.strip()
+
+    def stream(self, system_prompt, prompt, temperature=0.2):
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system_prompt, prompt),
+            temperature=temperature,
+            stream=True
+        )
+        for event in response:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+
+class StubBackend(GenerationBackend):
+    """Offline backend for load tests.
+
+    Sleeps for the configured time-to-first-token, then emits `max_tokens`
+    words at `tokens_per_sec`. Words are drawn from the prompt with a seed
+    derived from the prompt, so the same request always gives the same answer.
+    """
+
+    def __init__(self, ttft_ms=STUB_TTFT_MS, tokens_per_sec=STUB_TOKENS_PER_SEC, max_tokens=STUB_MAX_TOKENS):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.max_tokens = max_tokens
+
+    def stream(self, system_prompt, prompt, temperature=0.2):
+
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vocabulary = prompt.split() or ["..."]
+
+        time.sleep(self.ttft_ms / 1000)
+        interval = 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0
+        next_at = time.perf_counter()
+
+        for i in range(self.max_tokens):
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield ("" if i == 0 else " ") + rng.choice(vocabulary)
+
+
+_backend = None
+
+def get_backend():
+    """Return the backend selected by GENERATION_BACKEND, created once per process."""
+
+    global _backend
+    if _backend is None:
+        if GENERATION_BACKEND == "groq":
+            _backend = OpenAICompatibleBackend(GROQ_BASE_URL, GROQ_API_KEY, GENERATION_MODEL)
+        elif GENERATION_BACKEND == "local":
+            _backend = OpenAICompatibleBackend(LOCAL_LLM_BASE_URL, LOCAL_LLM_API_KEY, GENERATION_MODEL)
+        elif GENERATION_BACKEND == "stub":
+            _backend = StubBackend()
+        else:
+            raise ValueError(f"Unknown GENERATION_BACKEND: {GENERATION_BACKEND!r}")
+
+    return _backend
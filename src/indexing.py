@@ -1,6 +1,8 @@
 import os, pickle, faiss
+import numpy as np
 from transformers import AutoTokenizer, logging
 from embedder import embed_texts
+from config import NEIGHBOR_K, INDEX_REDUCE_DIM, INDEX_TRANSFORM, INDEX_FP16, INDEX_OPQ_M
 
 logging.set_verbosity_error()
 
@@ -121,23 +123,107 @@ def section_chunker(filepath: str, metadata: dict, section_headers, chunk_size_t
 
     return all_chunks
 
-def build_faiss_index(chunks):
+def make_faiss_index(dim, reduce_dim=INDEX_REDUCE_DIM, transform=INDEX_TRANSFORM, fp16=INDEX_FP16):
+    """Empty L2 index, optionally with a trained dimensionality reduction and float16 storage.
+
+    With `reduce_dim`, vectors pass through a PCA (or OPQ) transform to
+    `reduce_dim` dimensions inside a FAISS IndexPreTransform; the index then
+    needs `train` before `add`.
+    """
+    out_dim = reduce_dim if reduce_dim and reduce_dim < dim else dim
+
+    if fp16:
+        base = faiss.IndexScalarQuantizer(out_dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    else:
+        base = faiss.IndexFlatL2(out_dim)
+
+    if out_dim == dim:
+        return base
+
+    if transform == "opq":
+        vt = faiss.OPQMatrix(dim, INDEX_OPQ_M, out_dim)
+    elif transform == "pca":
+        vt = faiss.PCAMatrix(dim, out_dim)
+    else:
+        raise ValueError(f"Unknown INDEX_TRANSFORM: {transform!r}")
+
+    return faiss.IndexPreTransform(vt, base)
+
+def min_training_vectors(reduce_dim, transform=INDEX_TRANSFORM):
+    """Fewest training vectors the reduction can be trained on.
+
+    PCA needs at least as many vectors as output dimensions; OPQ runs k-means
+    with 256 centroids per sub-quantizer.
+    """
+    return 256 if transform == "opq" else reduce_dim
+
+def build_faiss_index(chunks, reduce_dim=INDEX_REDUCE_DIM, transform=INDEX_TRANSFORM, fp16=INDEX_FP16):
     
     texts = [c['text'] for c in chunks]
 
-    embeddings = embed_texts(texts)
+    embeddings = np.asarray(embed_texts(texts), dtype=np.float32)
 
     if embeddings.ndim == 1:
         embeddings = embeddings.reshape(1, -1)
 
     dim = embeddings.shape[1]
 
-    index = faiss.IndexFlatL2(dim)
+    if reduce_dim and reduce_dim < dim and len(embeddings) < min_training_vectors(reduce_dim, transform):
+        print(f"Warning: {len(embeddings)} vectors are too few to train {transform.upper()} to {reduce_dim} dims, "
+              f"keeping the full {dim}-dim index")
+        reduce_dim = 0
+
+    index = make_faiss_index(dim, reduce_dim=reduce_dim, transform=transform, fp16=fp16)
+
+    if not index.is_trained:
+        index.train(embeddings)
 
     index.add(embeddings)
 
     return index, chunks
 
+def build_neighbor_graph(index, k=NEIGHBOR_K, block_size=4096):
+    """k-nearest-neighbor graph over every vector in the index.
+
+    Searches the index with its own vectors, block by block, and drops each
+    chunk from its own neighbor list. Returns (ids, distances) as compact
+    (ntotal, k) int32 / float16 arrays; missing neighbors are -1.
+    """
+    # With a reduction, work on the stored (already transformed) vectors directly
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+
+    n = index.ntotal
+    vectors = index.reconstruct_n(0, n)
+    k = min(k, max(n - 1, 0))
+
+    ids = np.full((n, k), -1, dtype=np.int32)
+    distances = np.zeros((n, k), dtype=np.float16)
+
+    for start in range(0, n, block_size):
+        block = vectors[start:start + block_size]
+        D, I = index.search(block, k + 1)
+
+        # Move each chunk's own id to the end of its row, then keep the first k
+        is_self = I == np.arange(start, start + len(block))[:, None]
+        order = np.argsort(is_self, axis=1, kind="stable")
+        ids[start:start + len(block)] = np.take_along_axis(I, order, axis=1)[:, :k]
+        distances[start:start + len(block)] = np.take_along_axis(D, order, axis=1)[:, :k]
+
+    return ids, distances
+
+def save_neighbor_graph(ids, distances, filename_prefix="cached"):
+
+    np.savez(f"{filename_prefix}_neighbors.npz", ids=ids, distances=distances)
+
+def load_neighbor_graph(prefix):
+
+    try:
+        with np.load(f"{prefix}_neighbors.npz") as graph:
+            return graph["ids"], graph["distances"]
+    except FileNotFoundError:
+        return None, None
+
 def save_index(index, chunks, filename_prefix="cached"):
 
     faiss.write_index(index, f"{filename_prefix}.index")
@@ -0,0 +1,173 @@
+# jobs.py
+#
+# In-process background job queue for long answers. Jobs are ordered by
+# priority, each mode has its own concurrency limit, identical pending jobs
+# are merged, and finished results are kept for a limited time.
+
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config import (
+    JOB_WORKERS, JOB_MODE_LIMITS, JOB_MODE_PRIORITIES,
+    JOB_MAX_QUEUED, JOB_RESULT_TTL_S, JOB_MAX_RETAINED
+)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, key, request, mode, priority):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.request = request
+        self.mode = mode
+        self.priority = priority
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "mode": self.mode,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == DONE:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """Run `handler(request)` for submitted jobs on a pool of worker threads."""
+
+    def __init__(self, handler, workers=JOB_WORKERS, mode_limits=JOB_MODE_LIMITS, mode_priorities=JOB_MODE_PRIORITIES,
+                 max_queued=JOB_MAX_QUEUED, result_ttl_s=JOB_RESULT_TTL_S, max_retained=JOB_MAX_RETAINED):
+        self.handler = handler
+        self.mode_limits = mode_limits
+        self.mode_priorities = mode_priorities
+        self.max_queued = max_queued
+        self.result_ttl_s = result_ttl_s
+        self.max_retained = max_retained
+
+        self._jobs = {}
+        self._pending = {}           # dedup key -> queued or running job
+        self._finished = OrderedDict()  # job id -> finish time, oldest first
+        self._queues = {}            # mode -> heap of (priority, seq, job)
+        self._running = {}           # mode -> running count
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, key, request, mode, priority=None):
+        """Queue a job, or return the identical one already pending.
+
+        Returns (job, deduplicated). Raises QueueFull when too many jobs wait.
+        """
+        with self._cond:
+            self._purge()
+
+            existing = self._pending.get(key)
+            if existing is not None:
+                return existing, True
+
+            if sum(len(q) for q in self._queues.values()) >= self.max_queued:
+                raise QueueFull()
+
+            if priority is None:
+                priority = self.mode_priorities.get(mode, 0)
+            job = Job(key, request, mode, priority)
+            self._jobs[job.id] = job
+            self._pending[key] = job
+            heapq.heappush(self._queues.setdefault(mode, []), (priority, next(self._seq), job))
+            self._cond.notify()
+
+            return job, False
+
+    def get(self, job_id):
+
+        with self._cond:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def stats(self):
+
+        with self._cond:
+            return {
+                "queued": {mode: len(q) for mode, q in self._queues.items()},
+                "running": dict(self._running),
+                "retained": len(self._finished),
+            }
+
+    def _next_job(self):
+        """Best queued job whose mode is under its concurrency limit. Caller holds the lock."""
+        best = None
+        for mode, q in self._queues.items():
+            if not q or self._running.get(mode, 0) >= self.mode_limits.get(mode, float("inf")):
+                continue
+            if best is None or q[0][:2] < best[0][:2]:
+                best = q[0], mode
+
+        if best is None:
+            return None
+
+        _, mode = best
+        _, _, job = heapq.heappop(self._queues[mode])
+        self._running[mode] = self._running.get(mode, 0) + 1
+        return job
+
+    def _work(self):
+
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                result, error = self.handler(job.request), None
+            except Exception as e:
+                result, error = None, str(e)
+
+            with self._cond:
+                job.result, job.error = result, error
+                job.status = DONE if error is None else FAILED
+                job.finished_at = time.time()
+                self._running[job.mode] -= 1
+                self._pending.pop(job.key, None)
+                self._finished[job.id] = job.finished_at
+                # A slot for this mode is free again
+                self._cond.notify_all()
+
+    def _purge(self):
+        """Drop finished jobs past their TTL or beyond the retention cap. Caller holds the lock."""
+        cutoff = time.time() - self.result_ttl_s
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at >= cutoff and len(self._finished) <= self.max_retained:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
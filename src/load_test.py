@@ -0,0 +1,124 @@
+# load_test.py
+#
+# End-to-end load test for /ask. Drives the API with concurrent clients and
+# reports throughput plus latency percentiles overall and per stage (embed,
+# search, rerank, generate, extract) from the timings the API returns.
+# Answers served from the answer cache count towards throughput but not
+# towards the stage percentiles.
+#
+# Offline run against the in-process app with the stub backend:
+#   GENERATION_BACKEND=stub python load_test.py --in-process --concurrency 16
+# LLM-free extractive mode (needs no backend at all):
+#   python load_test.py --in-process --mode extractive --unique --concurrency 16
+# Against a running server:
+#   python load_test.py --url http://localhost:8000 --concurrency 16
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+QUESTIONS = [
+    "What is the general will?",
+    "Why can sovereignty not be represented?",
+    "How did private property give rise to inequality?",
+    "What is the role of the legislator?",
+    "Do the arts and sciences corrupt morals?",
+    "What distinguishes public economy from private economy?",
+    "When is a dictatorship justified?",
+    "Why does the state need a civil religion?",
+]
+
+
+def percentile(values, pct):
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+async def worker(client, jobs, args, totals, stages, errors, cached):
+
+    while True:
+        try:
+            i = jobs.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+
+        question = QUESTIONS[i % len(QUESTIONS)]
+        payload = {
+            "query": f"{question} (#{i})" if args.unique else question,
+            "chunk_count": args.chunk_count,
+            "mode": args.mode,
+        }
+        start = time.perf_counter()
+        try:
+            response = await client.post("/ask", json=payload)
+            if response.status_code == 503:
+                errors.append("shed (503)")
+                continue
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+            continue
+        totals.append((time.perf_counter() - start) * 1000)
+
+        body = response.json()
+        if body.get("cached"):
+            cached.append(1)
+            continue
+        for stage, ms in body.get("timings", {}).items():
+            stages.setdefault(stage, []).append(ms)
+
+async def run(args):
+
+    if args.in_process:
+        from api import app
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+
+    jobs = asyncio.Queue()
+    for i in range(args.requests):
+        jobs.put_nowait(i)
+
+    totals, stages, errors, cached = [], {}, [], []
+
+    async with client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, jobs, args, totals, stages, errors, cached) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, mode {args.mode}")
+    shed = errors.count("shed (503)")
+    print(f"throughput: {len(totals) / elapsed:.2f} req/s over {elapsed:.1f} s, "
+          f"{len(cached)} from cache, {shed} shed, {len(errors) - shed} errors")
+    print(f"{'stage':>10} | {'p50':>9} | {'p90':>9} | {'p99':>9} | {'mean':>9}")
+    for stage, values in [("total", totals)] + sorted(stages.items()):
+        print(f"{stage:>10} | {percentile(values, 50):7.1f}ms | {percentile(values, 90):7.1f}ms "
+              f"| {percentile(values, 99):7.1f}ms | {statistics.mean(values) if values else 0:7.1f}ms")
+    if len(errors) > shed:
+        print(f"first error: {next(e for e in errors if e != 'shed (503)')}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /ask endpoint.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="Drive the app in-process instead of over HTTP")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--chunk-count", type=int, default=5)
+    parser.add_argument("--mode", default="retrieval", choices=["understanding", "retrieval", "extractive"])
+    parser.add_argument("--unique", action="store_true", help="Make every question distinct so none is answered from the cache")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# querylog.py
+#
+# Compact query records appended to a rotating JSON-lines log. Records go
+# through a queue to a background listener thread, so logging never blocks
+# the request path on disk I/O.
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import QUERY_LOG_ENABLED, QUERY_LOG_PATH, QUERY_LOG_MAX_BYTES, QUERY_LOG_BACKUPS
+
+
+class QueryLogger:
+
+    def __init__(self, path=QUERY_LOG_PATH, max_bytes=QUERY_LOG_MAX_BYTES, backups=QUERY_LOG_BACKUPS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        self._listener = QueueListener(queue.Queue(), file_handler)
+        self._logger = logging.getLogger(f"philquery.querylog.{path}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.addHandler(QueueHandler(self._listener.queue))
+
+        self._listener.start()
+        atexit.register(self._listener.stop)
+
+    def log(self, query, mode, top_k, timings=None, cache_hit=False, corpus=None, origin="api", **extra):
+
+        record = {
+            "ts": round(time.time(), 3),
+            "query": query,
+            "mode": mode,
+            "top_k": top_k,
+            "corpus": corpus,
+            "timings": {stage: round(ms, 1) for stage, ms in (timings or {}).items()},
+            "cache_hit": cache_hit,
+            "origin": origin,
+            **extra,
+        }
+        self._logger.info(json.dumps(record, ensure_ascii=False))
+
+
+class _NullQueryLogger:
+
+    def log(self, *args, **kwargs):
+        pass
+
+
+_query_logger = None
+_lock = threading.Lock()
+
+def get_query_logger(path=QUERY_LOG_PATH):
+    """Process-wide query logger, writing to `path` on first use; a no-op when QUERY_LOG_ENABLED is off."""
+
+    global _query_logger
+    if _query_logger is None:
+        with _lock:
+            if _query_logger is None:
+                _query_logger = QueryLogger(path) if QUERY_LOG_ENABLED else _NullQueryLogger()
+
+    return _query_logger
+
+def read_query_log(path=QUERY_LOG_PATH, backups=QUERY_LOG_BACKUPS):
+    """Yield logged records, oldest rotated file first."""
+    paths = [f"{path}.{i}" for i in range(backups, 0, -1)] + [path]
+    for p in paths:
+        if not os.path.exists(p):
+            continue
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
@@ -0,0 +1,59 @@
+import threading
+import time
+from sentence_transformers import CrossEncoder
+
+from cache import LRUCache
+from config import RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_BUDGET_MS, RERANK_CACHE_SIZE
+
+_model = None
+_lock = threading.Lock()
+_cache = LRUCache(RERANK_CACHE_SIZE)
+
+
+def get_cross_encoder():
+
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                _model = CrossEncoder(RERANK_MODEL, device="cpu")
+
+    return _model
+
+def rerank(question, candidates, chunk_store, top_n, batch_size=RERANK_BATCH_SIZE, budget_ms=RERANK_BUDGET_MS):
+    """Rescore dense-search candidates with a cross-encoder and keep the best `top_n`.
+
+    `candidates` are chunk ids in dense-distance order. Candidates are scored in
+    batches until the latency budget runs out; anything left unscored keeps its
+    dense rank behind the scored ones. Returns a list of (chunk_id, score) pairs,
+    where score is None for unscored candidates.
+    """
+    key = (question, tuple(candidates), top_n)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    model = get_cross_encoder()
+    deadline = time.perf_counter() + budget_ms / 1000
+
+    scored = []
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        scores = model.predict(
+            [(question, chunk_store[idx]['text']) for idx in batch],
+            batch_size=batch_size,
+            show_progress_bar=False
+        )
+        scored.extend(zip(batch, (float(s) for s in scores)))
+        if time.perf_counter() >= deadline:
+            break
+
+    scored.sort(key=lambda pair: pair[1], reverse=True)
+    unscored = [(idx, None) for idx in candidates[len(scored):]]
+    result = (scored + unscored)[:top_n]
+
+    # Only cache complete rankings so a budget cut-off does not stick around
+    if not unscored:
+        _cache.put(key, result)
+
+    return result
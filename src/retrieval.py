@@ -1,5 +1,9 @@
-from config import client
+import time
+from config import RERANK_ENABLED, RERANK_CANDIDATES, RERANK_TOP_N
 from embedder import embed_texts
+from extractive import extract_highlights, format_highlights
+from generation import get_backend
+import reranker
 
 def get_system_prompt(mode):
     if mode == "understanding":
@@ -58,15 +62,55 @@ Summary: The passage outlines the government's responsibility in managing public
 Quote: "The government is not the master of the people but their servant; it exists to protect their rights and promote their welfare."
 """
 
-def ask_question(question, index, chunk_store, mode="understanding", top_k=5):
-    question_embedding = embed_texts([question])
-
-    D, I = index.search(question_embedding, top_k)
-
+def _elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+def retrieve_chunks(question, index, chunk_store, top_k=5, rerank=None, timings=None, batcher=None, return_embedding=False):
+    """Return the chunk ids to send to the LLM, best first.
+
+    With reranking on, a wider candidate set is pulled from FAISS and rescored
+    by the cross-encoder, and only the best few of them are kept. When a
+    `batching.QueryBatcher` is given, the embed and search run batched with
+    other concurrent questions. Per-stage latencies in milliseconds are
+    written to `timings` when a dict is given. With `return_embedding`,
+    returns (ids, question_embedding) so later stages can reuse the vector.
+    """
+    if rerank is None:
+        rerank = RERANK_ENABLED
+    if timings is None:
+        timings = {}
+
+    k = max(top_k, RERANK_CANDIDATES) if rerank else top_k
+
+    if batcher is not None:
+        D, I, question_embedding = batcher.search(question, k, timings=timings, return_embedding=True)
+    else:
+        start = time.perf_counter()
+        question_embedding = embed_texts([question], show_progress_bar=False)
+        timings["embed"] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        D, I = index.search(question_embedding, k)
+        timings["search"] = _elapsed_ms(start)
+
+    hits = [int(idx) for idx in I[0] if idx >= 0]
+
+    if rerank:
+        start = time.perf_counter()
+        ranked = reranker.rerank(question, hits, chunk_store, top_n=min(top_k, RERANK_TOP_N))
+        timings["rerank"] = _elapsed_ms(start)
+        hits = [idx for idx, _ in ranked]
+
+    if return_embedding:
+        return hits, question_embedding
+    return hits
+
+def build_prompt(question, hits, chunk_store):
+    """Build the LLM user prompt and the citation list for the given chunk ids."""
     context_parts = []
     citations = []
 
-    for i, idx in enumerate(I[0]):
+    for i, idx in enumerate(hits):
         item = chunk_store[idx]
         meta = item['metadata']
         context_parts.append(
@@ -86,14 +130,107 @@ def ask_question(question, index, chunk_store, mode="understanding", top_k=5):
 Question: {question}
 Answer:"""
 
-    response = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[
-            {"role": "system", "content": get_system_prompt(mode)},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.2
+    return prompt, citations
+
+def build_citations(hits, chunk_store, highlights):
+    """Citations for extractive mode, quoting each source's best-matching sentence."""
+    best = {}
+    for h in highlights:
+        best.setdefault(h['chunk_id'], h['text'])
+
+    citations = []
+    for i, idx in enumerate(hits):
+        meta = chunk_store[idx]['metadata']
+        excerpt = best.get(idx, chunk_store[idx]['text'][:60].strip() + "...")
+        citations.append(
+            f"[{i+1}] {meta.get('source_title')} by {meta.get('author')}:\n"
+            f"(Excerpt: \"{excerpt}\")"
+        )
+
+    return citations
+
+def answer_question(question, index, chunk_store, mode="understanding", top_k=5, rerank=None, backend=None, batcher=None):
+    """Retrieve context and generate an answer.
+
+    Returns a dict with the answer text, the formatted citations, the chunk ids
+    used as context and per-stage timings in milliseconds. "extractive" mode
+    makes no LLM call and also returns the sentence highlights.
+    """
+    timings = {}
+    hits, question_embedding = retrieve_chunks(
+        question, index, chunk_store, top_k=top_k, rerank=rerank, timings=timings, batcher=batcher, return_embedding=True
     )
-    answer = response.choices[0].message.content.strip()
 
-    return f"{answer}\n\n---\n**Sources Consulted:**\n\n" + "\n\n".join(citations)
\ No newline at end of file
+    if mode == "extractive":
+        start = time.perf_counter()
+        highlights = extract_highlights(question, hits, chunk_store, question_embedding=question_embedding)
+        timings["extract"] = _elapsed_ms(start)
+
+        return {
+            "answer": format_highlights(highlights),
+            "sources": build_citations(hits, chunk_store, highlights),
+            "chunk_ids": hits,
+            "highlights": highlights,
+            "timings": timings
+        }
+
+    if backend is None:
+        backend = get_backend()
+
+    prompt, citations = build_prompt(question, hits, chunk_store)
+
+    start = time.perf_counter()
+    answer = backend.complete(get_system_prompt(mode), prompt, temperature=0.2)
+    timings["generate"] = _elapsed_ms(start)
+
+    return {
+        "answer": answer,
+        "sources": citations,
+        "chunk_ids": hits,
+        "timings": timings
+    }
+
+def stream_answer(question, index, chunk_store, mode="understanding", top_k=5, rerank=None, backend=None, batcher=None, timings=None):
+    """Yield the answer as it is generated, followed by the sources footer.
+
+    The concatenated output is identical in shape to `ask_question`. Per-stage
+    latencies are written to `timings` when a dict is given; they are complete
+    once the generator is exhausted.
+    """
+    if timings is None:
+        timings = {}
+
+    hits, question_embedding = retrieve_chunks(
+        question, index, chunk_store, top_k=top_k, rerank=rerank, timings=timings, batcher=batcher, return_embedding=True
+    )
+
+    if mode == "extractive":
+        start = time.perf_counter()
+        highlights = extract_highlights(question, hits, chunk_store, question_embedding=question_embedding)
+        timings["extract"] = _elapsed_ms(start)
+
+        yield format_highlights(highlights)
+        yield "\n\n---\n**Sources Consulted:**\n\n" + "\n\n".join(build_citations(hits, chunk_store, highlights))
+        return
+
+    if backend is None:
+        backend = get_backend()
+
+    prompt, citations = build_prompt(question, hits, chunk_store)
+
+    start = time.perf_counter()
+    for i, fragment in enumerate(backend.stream(get_system_prompt(mode), prompt, temperature=0.2)):
+        if i == 0:
+            timings["first_token"] = _elapsed_ms(start)
+        yield fragment
+    timings["generate"] = _elapsed_ms(start)
+
+    yield "\n\n---\n**Sources Consulted:**\n\n" + "\n\n".join(citations)
+
+def format_answer(result):
+    return f"{result['answer']}\n\n---\n**Sources Consulted:**\n\n" + "\n\n".join(result['sources'])
+
+def ask_question(question, index, chunk_store, mode="understanding", top_k=5, rerank=None):
+    result = answer_question(question, index, chunk_store, mode=mode, top_k=top_k, rerank=rerank)
+
+    return format_answer(result)
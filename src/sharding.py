@@ -0,0 +1,291 @@
+# sharding.py
+#
+# Sharded index layout: one FAISS index + chunk store per source, listed in
+# a manifest, searched in parallel by a ShardRouter that behaves like a single
+# FAISS index over the concatenated chunk store. Shards can also be served by
+# separate worker processes:
+#
+#   SHARD_AUTHKEY=<secret> python sharding.py serve the_social_contract --port 7001
+#
+# The RPC pickles requests and replies, so both ends must share a secret
+# SHARD_AUTHKEY; anyone holding it can run code in the other process.
+
+import argparse
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+from config import SHARD_DIR, SHARD_AUTHKEY, SHARD_SEARCH_WORKERS, SHARD_RPC_TIMEOUT_S
+from indexing import save_index, load_index, load_neighbor_graph
+
+MANIFEST = "manifest.json"
+
+
+def check_authkey(authkey=SHARD_AUTHKEY):
+    """Return the shard RPC key as bytes; raise RuntimeError if none is configured."""
+    if not authkey:
+        raise RuntimeError("SHARD_AUTHKEY must be set to a shared secret to serve or use remote shards")
+    return authkey.encode("utf-8")
+
+def shard_name(metadata):
+    """Stable shard name for a source, e.g. 'the_social_contract'."""
+    return re.sub(r"[^a-z0-9]+", "_", metadata["source_title"].lower()).strip("_")
+
+def read_manifest(shard_dir=SHARD_DIR):
+
+    path = os.path.join(shard_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_shard(name, index, chunks, metadata, shard_dir=SHARD_DIR):
+    """Write one shard and register it in the manifest, leaving other shards untouched."""
+    os.makedirs(shard_dir, exist_ok=True)
+    save_index(index, chunks, filename_prefix=os.path.join(shard_dir, name))
+
+    manifest = read_manifest(shard_dir)
+    manifest[name] = {**metadata, "chunks": len(chunks)}
+    with open(os.path.join(shard_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+class LocalShard:
+
+    def __init__(self, index, chunks):
+        self.index = index
+        self.chunks = chunks
+        self.ntotal = index.ntotal
+
+    def search(self, x, k):
+        return self.index.search(x, k)
+
+
+class RemoteShard:
+    """Client for a shard served by `serve_shard` in another process."""
+
+    def __init__(self, address, authkey=SHARD_AUTHKEY, timeout_s=SHARD_RPC_TIMEOUT_S):
+        self.address = address
+        self.authkey = check_authkey(authkey)
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+        self.chunks = self._call("chunks")
+        self.ntotal = len(self.chunks)
+
+    def _conn(self):
+        # One connection per calling thread; connections are not thread-safe
+        if getattr(self._local, "conn", None) is None:
+            self._local.conn = Client(self.address, authkey=self.authkey)
+        return self._local.conn
+
+    def _drop(self):
+        conn, self._local.conn = getattr(self._local, "conn", None), None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, *request):
+        """Send one request and return the payload of the reply.
+
+        A broken connection (e.g. the worker restarted) is replaced and the
+        request retried once; a worker that does not answer within
+        `timeout_s` raises TimeoutError.
+        """
+        for attempt in range(2):
+            try:
+                conn = self._conn()
+                conn.send(request)
+                ready = conn.poll(self.timeout_s)
+                if ready:
+                    status, payload = conn.recv()
+            except (EOFError, OSError) as e:
+                self._drop()
+                if attempt:
+                    raise RuntimeError(f"Shard at {self.address} is unreachable: {e!r}") from e
+                continue
+
+            if not ready:
+                # A late reply would be read as the answer to the next request
+                self._drop()
+                raise TimeoutError(f"Shard at {self.address} did not answer within {self.timeout_s}s")
+            break
+
+        if status != "ok":
+            raise RuntimeError(f"Shard at {self.address} failed: {payload}")
+        return payload
+
+    def search(self, x, k):
+        return self._call("search", np.ascontiguousarray(x, dtype=np.float32), k)
+
+
+class ShardRouter:
+    """Fan a search out to several shards and merge the top-k by distance.
+
+    Exposes `search(x, k)` and `ntotal` like a FAISS index; returned ids index
+    into `chunks`, the concatenation of all shard chunk stores.
+    """
+
+    def __init__(self, shards, max_workers=SHARD_SEARCH_WORKERS):
+        self.shards = shards
+        self.offsets = {}
+        self.chunks = []
+        for name, shard in shards.items():
+            self.offsets[name] = len(self.chunks)
+            self.chunks.extend(shard.chunks)
+        self.ntotal = len(self.chunks)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(shards) or 1)
+
+    def route(self, author=None, source_titles=None):
+        """Names of the shards matching an author and/or a set of source titles."""
+        names = []
+        for name, shard in self.shards.items():
+            meta = shard.chunks[0]["metadata"] if shard.chunks else {}
+            if author is not None and meta.get("author") != author:
+                continue
+            if source_titles is not None and meta.get("source_title") not in source_titles:
+                continue
+            names.append(name)
+        return names
+
+    def search(self, x, k, shards=None):
+        names = list(self.shards) if shards is None else shards
+        futures = [(name, self._pool.submit(self.shards[name].search, x, k)) for name in names]
+
+        distances, ids = [], []
+        for name, future in futures:
+            D, I = future.result()
+            distances.append(D)
+            ids.append(np.where(I >= 0, I + self.offsets[name], -1))
+
+        D = np.concatenate(distances, axis=1)
+        I = np.concatenate(ids, axis=1)
+        order = np.argsort(D, axis=1, kind="stable")[:, :k]
+
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def view(self, shards):
+        """An index-like object that only searches the named shards."""
+        return ShardView(self, shards)
+
+
+class ShardView:
+
+    def __init__(self, router, shards):
+        self.router = router
+        self.shards = list(shards)
+        self.ntotal = sum(router.shards[name].ntotal for name in self.shards)
+
+    def search(self, x, k):
+        return self.router.search(x, k, shards=self.shards)
+
+def load_sharded_index(shard_dir=SHARD_DIR, names=None, remotes=None):
+    """Load the shards listed in the manifest into a ShardRouter.
+
+    `remotes` maps shard names to (host, port) addresses of shard workers;
+    those shards are searched over RPC instead of being loaded here.
+    Returns (router, chunks), or (None, None) if nothing could be loaded.
+    """
+    remotes = remotes or {}
+    shards = {}
+
+    for name in read_manifest(shard_dir):
+        if names is not None and name not in names:
+            continue
+        if name in remotes:
+            shards[name] = RemoteShard(remotes[name])
+            continue
+        index, chunks = load_index(os.path.join(shard_dir, name))
+        if index is None:
+            print(f"Warning: could not load shard '{name}'")
+            continue
+        shards[name] = LocalShard(index, chunks)
+
+    if not shards:
+        return None, None
+
+    router = ShardRouter(shards)
+    return router, router.chunks
+
+def load_sharded_neighbors(router, shard_dir=SHARD_DIR):
+    """Concatenate the shards' neighbor graphs into router-wide chunk ids.
+
+    Neighbors stay within their shard. Returns (None, None) if any shard
+    has no graph.
+    """
+    all_ids, all_distances = [], []
+    for name in router.shards:
+        ids, distances = load_neighbor_graph(os.path.join(shard_dir, name))
+        if ids is None:
+            return None, None
+        all_ids.append(np.where(ids >= 0, ids + router.offsets[name], -1).astype(np.int32))
+        all_distances.append(distances)
+
+    return np.concatenate(all_ids), np.concatenate(all_distances)
+
+def serve_shard(name, address, shard_dir=SHARD_DIR, authkey=SHARD_AUTHKEY):
+    """Serve one shard to RemoteShard clients, one thread per connection."""
+    authkey = check_authkey(authkey)
+    index, chunks = load_index(os.path.join(shard_dir, name))
+    if index is None:
+        raise SystemExit(f"Could not load shard '{name}' from {shard_dir}")
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    return
+                try:
+                    if request[0] == "search":
+                        conn.send(("ok", index.search(request[1], request[2])))
+                    elif request[0] == "chunks":
+                        conn.send(("ok", chunks))
+                    else:
+                        conn.send(("error", f"unknown request {request[0]!r}"))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+
+    with Listener(address, authkey=authkey) as listener:
+        print(f"Serving shard '{name}' ({index.ntotal} vectors) on {address[0]}:{address[1]}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, OSError) as e:
+                # A client with the wrong key (or a port scan) must not stop the worker
+                print(f"Warning: rejected connection: {e!r}")
+                continue
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+def parse_remotes(spec):
+    """Parse 'name=host:port,name=host:port' into {name: (host, port)}."""
+    remotes = {}
+    for item in filter(None, (s.strip() for s in (spec or "").split(","))):
+        name, addr = item.split("=", 1)
+        host, port = addr.rsplit(":", 1)
+        remotes[name] = (host, int(port))
+    return remotes
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Serve one shard to other processes")
+    serve.add_argument("name")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=7001)
+    serve.add_argument("--shard-dir", default=SHARD_DIR)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve_shard(args.name, (args.host, args.port), shard_dir=args.shard_dir)
+
+if __name__ == "__main__":
+    main()
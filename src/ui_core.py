@@ -0,0 +1,169 @@
+# ui_core.py
+#
+# Shared page for local_ui.py and cloud_ui.py. Each app only sets its page
+# config and calls render_app().
+
+import httpx
+import streamlit as st
+
+from src.config import CACHE_PREFIX, PHILQUERY_API_URL
+from src.querylog import get_query_logger
+
+
+@st.cache_resource
+def get_index():
+    from src.indexing import load_index
+    return load_index(prefix=CACHE_PREFIX)
+
+def stream_from_api(question, mode, num_chunks):
+    """Stream the answer from the FastAPI service's /ask/stream endpoint."""
+    payload = {"query": question, "chunk_count": num_chunks, "mode": mode}
+    with httpx.stream("POST", f"{PHILQUERY_API_URL.rstrip('/')}/ask/stream", json=payload, timeout=120.0) as response:
+        response.raise_for_status()
+        yield from response.iter_text()
+
+def stream_in_process(question, mode, num_chunks):
+    from src.retrieval import stream_answer
+    index, chunks = get_index()
+    timings = {}
+    yield from stream_answer(question, index, chunks, mode=mode, top_k=num_chunks, timings=timings)
+    # The API logs its own queries; only answers produced in this process are logged here
+    get_query_logger().log(question, mode, num_chunks, timings=timings, corpus=CACHE_PREFIX, origin="ui")
+
+def render_intro():
+
+    # --- Header ---
+    st.title("PhilQuery 📜")
+
+    st.divider()
+
+    # --- Introduction & Knowledge Base ---
+    col1, col2 = st.columns([3, 2])
+
+    with col1:
+        st.markdown("""
+        **Welcome.**
+
+        PhilQuery provides answers grounded *exclusively* in the indexed philosophical texts.
+        Engage with core ideas directly from the source.
+
+        > *"Seek understanding from the text itself."*
+        """)
+
+    with col2:
+        st.subheader("Source Texts")
+        st.markdown("""
+        - **Jean-Jacques Rousseau:**
+            - *The Social Contract*
+            - *Discourse on Inequality*
+            - *Discourse on Political Economy*
+            - *Other early discourses*
+        """)
+
+    # --- How it Works Expander ---
+    with st.expander("Understanding the Process ⚙️"):
+        st.markdown("""
+        PhilQuery employs semantic search to find relevant passages within the texts for your query.
+
+        An AI then synthesizes an answer based *solely* on these findings.
+
+        Key source passages are cited with excerpts for transparency and direct reference.
+        """)
+
+    st.divider()
+
+def render_query():
+
+    st.markdown("### Ask Your Question")
+
+    # Add mode selector
+    mode = st.radio(
+        "Select mode:",
+        ["understanding", "retrieval", "extractive"],
+        horizontal=True,
+        help="Understanding: Get a comprehensive analysis of the topic\nRetrieval: Find specific passages related to your query\nExtractive: Highlight the most relevant sentences instantly, without an AI summary"
+    )
+
+    # Add slider for number of chunks
+    num_chunks = st.slider(
+        "Number of source passages to consider",
+        min_value=1,
+        max_value=10,
+        value=5,
+        help="Adjust how many relevant passages from the texts should be used to generate the answer"
+    )
+
+    with st.expander("ℹ️ Understanding the number of passages"):
+        st.markdown("""
+        **Fewer passages (1-3):**
+        - ✅ More focused and concise answers
+        - ✅ Better for specific, targeted questions
+        - ❌ May miss relevant context from other parts of the text
+        - ❌ Could lead to incomplete or biased responses
+
+        **More passages (7-10):**
+        - ✅ Broader context and more comprehensive answers
+            - ✅ Better for complex topics that span multiple sections
+            - ✅ More likely to capture nuanced relationships between ideas
+        - ❌ May include less relevant information
+        - ❌ Responses might be longer and more verbose
+        - ❌ Could potentially dilute the most relevant insights
+
+        **Medium (4-6):**
+        - ✅ Good balance between focus and comprehensiveness
+        - ✅ Suitable for most general questions
+        - ✅ Default setting for optimal results
+        """)
+
+    # The form only submits on Enter or the button, so moving the slider or
+    # switching modes reruns the script without asking again
+    with st.form("ask_form", border=False):
+        question = st.text_input(
+            "Enter your political philosophy question:",
+            placeholder="e.g., What is Rousseau's concept of the general will?",
+            label_visibility="collapsed",
+            key="question_input"
+        )
+        submitted = st.form_submit_button("Seek Insight")
+
+    answers = st.session_state.setdefault("answers", {})
+    question = question.strip()
+
+    if submitted and not question:
+        st.warning("Please enter a question to explore.")
+        return
+
+    if submitted:
+        key = (question, mode, num_chunks)
+        st.session_state.last_key = key
+
+        # Each question/settings combination is answered once per session
+        if key not in answers:
+            stream = stream_from_api if PHILQUERY_API_URL else stream_in_process
+            st.subheader("Response", divider="grey")
+            with st.spinner("Consulting the texts..."):
+                try:
+                    with st.container():
+                        answers[key] = st.write_stream(stream(question, mode, num_chunks))
+                except Exception as e:
+                    st.error(f"An error occurred while generating the response: {e}")
+            return
+
+    last_key = st.session_state.get("last_key")
+    if last_key in answers:
+        st.subheader("Response", divider="grey")
+        with st.container():
+            st.markdown(answers[last_key])
+
+def render_app():
+
+    render_intro()
+
+    # --- Main Application Logic ---
+    if not PHILQUERY_API_URL:
+        index, chunks = get_index()
+        if index is None or chunks is None:
+            st.error("Index data could not be loaded. Querying is disabled.")
+            return
+
+    render_query()
@@ -0,0 +1,132 @@
+# warm_cache.py
+#
+# Offline answer cache warm-up. Mines the query log for the most frequent
+# questions, groups near-identical phrasings by embedding similarity to rank
+# topics by total demand, and pre-generates retrieval results and answers for
+# every logged question of the top clusters into the answer cache file the
+# API loads at startup. Each answer is generated for, and keyed by, its own
+# question: phrasings that embed closely can still differ in meaning. build_index runs it after
+# every build so a fresh index does not start with a cold cache.
+
+import argparse
+from collections import Counter
+
+import numpy as np
+
+from cache import answer_cache_key, save_answer_cache
+from config import ANSWER_CACHE_PATH, CORPORA_DIR, DEFAULT_CORPUS, WARM_SIMILARITY, WARM_TOP_N
+from corpora import CorpusManager, CorpusNotFound
+from embedder import embed_texts
+from querylog import read_query_log
+from retrieval import answer_question
+
+SETTINGS_PER_QUESTION = 2
+
+
+def mine_queries(records):
+    """Count logged questions by normalized text.
+
+    Returns {normalized: {"text", "count", "settings"}}, where "text" is the
+    most common original phrasing and "settings" counts (mode, top_k, corpus).
+    """
+    queries = {}
+    for r in records:
+        if not r.get("query") or not r.get("mode") or not r.get("top_k"):
+            continue
+        normalized = " ".join(r["query"].lower().split())
+        entry = queries.setdefault(normalized, {"phrasings": Counter(), "count": 0, "settings": Counter()})
+        entry["phrasings"][r["query"].strip()] += 1
+        entry["count"] += 1
+        entry["settings"][(r["mode"], r["top_k"], r.get("corpus") or DEFAULT_CORPUS)] += 1
+
+    for entry in queries.values():
+        entry["text"] = entry.pop("phrasings").most_common(1)[0][0]
+
+    return queries
+
+def cluster_queries(queries, similarity=WARM_SIMILARITY):
+    """Greedily cluster questions whose embeddings have cosine >= `similarity`.
+
+    Questions are visited from most to least frequent, so each cluster's
+    representative is its most frequent question and its members (the
+    `mine_queries` entries) are in descending frequency. Returns clusters
+    sorted by total count.
+    """
+    ordered = sorted(queries.values(), key=lambda q: q["count"], reverse=True)
+    if not ordered:
+        return []
+
+    embeddings = np.asarray(embed_texts([q["text"] for q in ordered], show_progress_bar=False), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+
+    clusters, centers = [], []
+    for q, vector in zip(ordered, embeddings):
+        if centers:
+            sims = np.asarray(centers) @ vector
+            best = int(np.argmax(sims))
+            if sims[best] >= similarity:
+                cluster = clusters[best]
+                cluster["members"].append(q)
+                cluster["count"] += q["count"]
+                continue
+        clusters.append({
+            "representative": q["text"],
+            "members": [q],
+            "count": q["count"],
+        })
+        centers.append(vector)
+
+    return sorted(clusters, key=lambda c: c["count"], reverse=True)
+
+def warm(root=CORPORA_DIR, top_n=WARM_TOP_N, similarity=WARM_SIMILARITY, output=ANSWER_CACHE_PATH):
+    """Pre-generate answers for the questions of the top query clusters; returns the number of cache entries written."""
+
+    queries = mine_queries(read_query_log())
+    if not queries:
+        print("No logged queries, nothing to warm.")
+        return 0
+
+    clusters = cluster_queries(queries, similarity=similarity)[:top_n]
+    print(f"🔥 Warming answer cache for {len(clusters)} query clusters ({len(queries)} distinct questions logged)...")
+
+    corpora = CorpusManager(root, prefetch_top=0, batching=False)
+    entries = {}
+
+    for cluster in clusters:
+        for q in cluster["members"]:
+            for (mode, top_k, corpus_name), _ in q["settings"].most_common(SETTINGS_PER_QUESTION):
+                try:
+                    corpus = corpora.get(corpus_name)
+                    result = answer_question(q["text"], corpus.index, corpus.chunks, mode=mode, top_k=top_k)
+                except CorpusNotFound:
+                    print(f"Warning: corpus '{corpus_name}' not found, skipping")
+                    continue
+                except Exception as e:
+                    print(f"Warning: could not warm '{q['text']}' ({mode}): {e}")
+                    continue
+
+                entries[answer_cache_key(corpus_name, q["text"], mode, top_k)] = {
+                    "answer": result["answer"],
+                    "sources": result["sources"],
+                    "highlights": result.get("highlights"),
+                    "chunk_ids": result["chunk_ids"],
+                    "timings": result["timings"]
+                }
+
+    fingerprints = {name: corpora.fingerprint(name) for name in {key[0] for key in entries}}
+    save_answer_cache(entries, output, fingerprints=fingerprints)
+    print(f"✅ Saved {len(entries)} warm answer cache entries to {output}")
+
+    return len(entries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate answers for frequent logged questions.")
+    parser.add_argument("--top-n", type=int, default=WARM_TOP_N)
+    parser.add_argument("--similarity", type=float, default=WARM_SIMILARITY)
+    parser.add_argument("--output", default=ANSWER_CACHE_PATH)
+    args = parser.parse_args()
+
+    warm(top_n=args.top_n, similarity=args.similarity, output=args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Regression test: a streaming request that fails before generation starts
+# must give its LLM slot back.
+#
+#   python -m pytest tests
+
+import os
+import pickle
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+CORPUS_DIR = tempfile.mkdtemp(prefix="philquery-test-")
+os.environ.update({
+    "GENERATION_BACKEND": "stub",
+    "STUB_TTFT_MS": "0",
+    "CORPORA_DIR": CORPUS_DIR,
+    "QUERY_LOG_ENABLED": "false",
+    "ANSWER_CACHE_PATH": os.path.join(CORPUS_DIR, "answer_cache.pkl"),
+    "SHARD_REMOTES": "",
+})
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import faiss  # noqa: E402
+import embedder  # noqa: E402
+from config import DEFAULT_CORPUS  # noqa: E402
+
+
+class FakeEncoder:
+    """Deterministic stand-in for the sentence-transformer, so no model is downloaded."""
+
+    def encode(self, texts, show_progress_bar=False):
+        return np.asarray([
+            np.random.default_rng(abs(hash(t)) % 2**32).normal(size=16) for t in texts
+        ], dtype=np.float32)
+
+
+embedder._embedder = FakeEncoder()
+
+chunks = [
+    {"text": f"Passage {i} on the general will.", "metadata": {"source_title": "The Social Contract", "author": "Rousseau"}}
+    for i in range(20)
+]
+index = faiss.IndexFlatL2(16)
+index.add(FakeEncoder().encode([c["text"] for c in chunks]))
+faiss.write_index(index, os.path.join(CORPUS_DIR, f"{DEFAULT_CORPUS}.index"))
+with open(os.path.join(CORPUS_DIR, f"{DEFAULT_CORPUS}_chunk_store.pkl"), "wb") as f:
+    pickle.dump(chunks, f)
+
+import api  # noqa: E402
+import retrieval  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return TestClient(api.app, raise_server_exceptions=False)
+
+
+def test_failed_stream_releases_llm_slot(client, monkeypatch):
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("search failed")
+
+    monkeypatch.setattr(retrieval, "retrieve_chunks", fail)
+
+    for i in range(3):
+        client.post("/ask/stream", json={"query": f"question {i}", "mode": "understanding"})
+
+    assert api.admission.metrics()["inflight_llm"] == 0
+
+
+def test_completed_stream_releases_llm_slot(client):
+
+    response = client.post("/ask/stream", json={"query": "What is the general will?", "mode": "understanding"})
+
+    assert response.status_code == 200
+    assert "Sources Consulted" in response.text
+    assert api.admission.metrics()["inflight_llm"] == 0